@@ -0,0 +1,248 @@
+import asyncio
+import codecs
+import json
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+from typing import Iterator
+
+import requests
+
+from metrics import add_connect_time
+from resilience import ConnectFailed
+
+# Optional: without httpx every backend call stays on the requests session
+try:
+    import httpx
+except ImportError:
+    httpx = None
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Run backend I/O on one asyncio loop per process instead of one blocking socket per call
+ASYNC_ENABLED = httpx is not None and os.getenv("BACKEND_ASYNC", "1") not in ("0", "false", "False")
+# Negotiate HTTP/2 (ALPN on https://) so concurrent turns multiplex over a few connections; needs h2
+HTTP2_ENABLED = h2 is not None and os.getenv("BACKEND_HTTP2", "1") not in ("0", "false", "False")
+# Speak HTTP/2 on plain http:// too (prior knowledge); only for backends that accept h2c
+H2C_ENABLED = HTTP2_ENABLED and os.getenv("BACKEND_H2C", "0") in ("1", "true", "True")
+# Hop-by-hop headers that HTTP/2 forbids
+_CONNECTION_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+
+_END = object()
+
+
+def _as_requests_error(error: Exception) -> Exception:
+    """Map httpx transport errors onto the requests exceptions the retry logic understands"""
+    message = str(error) or type(error).__name__
+    # Only these fail before the request is written; see is_retryable_error
+    if isinstance(error, (httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return requests.ConnectTimeout(message)
+    if isinstance(error, httpx.ConnectError):
+        return ConnectFailed(message)
+    if isinstance(error, httpx.TimeoutException):
+        return requests.ReadTimeout(message)
+    if isinstance(error, httpx.TransportError):
+        return requests.ConnectionError(message)
+    return error
+
+
+def _timeout(timeout) -> "httpx.Timeout":
+    """requests-style timeout (seconds or a (connect, read) pair) as an httpx.Timeout"""
+    if timeout is None:
+        return httpx.Timeout(None)
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+class AsyncResponse:
+    """requests.Response look-alike for a reply read on the event loop
+
+    Status, headers and elapsed are set when the call returns; a streamed body is
+    pumped by the loop into a queue, so iter_content / iter_lines / close work from
+    whichever thread holds the response.
+    """
+
+    def __init__(self, response: "httpx.Response", loop: asyncio.AbstractEventLoop, elapsed: float):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.reason = response.reason_phrase
+        self.url = str(response.url)
+        self.elapsed = timedelta(seconds=elapsed)
+        self.encoding = response.charset_encoding
+        self.connect_ms = 0.0
+        self._response = response
+        self._loop = loop
+        self._chunks = queue.Queue()
+        self._content = None
+        self._task = None
+        self._closed = False
+
+    @property
+    def num_bytes_downloaded(self) -> int:
+        """Body bytes read off the connection so far, before decompression"""
+        return self._response.num_bytes_downloaded
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = b"".join(self._iter_raw())
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise requests.HTTPError(f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}",
+                                     response=self)
+
+    def iter_content(self, chunk_size: int = None, decode_unicode: bool = False) -> Iterator:
+        """Body chunks as they arrive (chunk_size is ignored: chunks are whatever the loop read)"""
+        chunks = iter([self._content]) if self._content is not None else self._iter_raw()
+        if not decode_unicode:
+            yield from chunks
+            return
+        decoder = codecs.getincrementaldecoder(self.encoding or "utf-8")(errors="replace")
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    def iter_lines(self, decode_unicode: bool = False) -> Iterator:
+        """Same line splitting as requests.Response.iter_lines"""
+        pending = None
+        for chunk in self.iter_content(decode_unicode=decode_unicode):
+            if pending is not None:
+                chunk = pending + chunk
+            lines = chunk.splitlines()
+            if lines and lines[-1] and chunk and lines[-1][-1] == chunk[-1]:
+                pending = lines.pop()
+            else:
+                pending = None
+            yield from lines
+        if pending is not None:
+            yield pending
+
+    def close(self):
+        """Stop reading the body and give the stream back to the connection"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _iter_raw(self) -> Iterator[bytes]:
+        while True:
+            item = self._chunks.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def _pump(self):
+        try:
+            async for chunk in self._response.aiter_bytes():
+                self._chunks.put(chunk)
+        except asyncio.CancelledError:
+            # Closed mid-body: the reader must see an error, never a short body that looks complete
+            self._chunks.put(requests.ConnectionError("response closed"))
+            raise
+        except Exception as e:
+            self._chunks.put(_as_requests_error(e))
+        finally:
+            await self._response.aclose()
+            self._chunks.put(_END)
+
+
+class AsyncHTTPClient:
+    """httpx.AsyncClient on a dedicated event loop thread, called through a blocking requests-style API
+
+    Every session in the process shares the loop and its connection pool. Callers still
+    block, but only on a future: the sockets, TLS and HTTP/2 streams all live on the loop,
+    so concurrent turns to one replica share a connection instead of holding one each.
+    """
+
+    def __init__(self, headers: dict = None, pool_size: int = 20, http2: bool = HTTP2_ENABLED,
+                 h2c: bool = H2C_ENABLED):
+        headers = {name: value for name, value in (headers or {}).items()
+                   if name.lower() not in _CONNECTION_HEADERS}
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            http1=not h2c,
+            http2=http2,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="backend-loop", daemon=True).start()
+
+    def get(self, url: str, params: dict = None, headers: dict = None, timeout=None,
+            stream: bool = False) -> AsyncResponse:
+        return self.request("GET", url, params=params, headers=headers, timeout=timeout, stream=stream)
+
+    def post(self, url: str, json: dict = None, headers: dict = None, timeout=None,
+             stream: bool = False) -> AsyncResponse:
+        return self.request("POST", url, json=json, headers=headers, timeout=timeout, stream=stream)
+
+    def request(self, method: str, url: str, timeout=None, stream: bool = False, **kwargs) -> AsyncResponse:
+        """Send on the loop and wait for the headers (and the whole body unless stream)"""
+        future = asyncio.run_coroutine_threadsafe(
+            self._request(method, url, _timeout(timeout), stream, kwargs), self._loop
+        )
+        response = future.result()
+        # Report connect time on the calling thread, like the requests adapter does
+        if response.connect_ms:
+            add_connect_time(response.connect_ms)
+        return response
+
+    async def _request(self, method: str, url: str, timeout: "httpx.Timeout", stream: bool,
+                       kwargs: dict) -> AsyncResponse:
+        connect = {}
+
+        async def trace(event: str, info: dict):
+            if event == "connection.connect_tcp.started":
+                connect["started"] = time.perf_counter()
+            elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                connect["ended"] = time.perf_counter()
+
+        started = time.perf_counter()
+        try:
+            request = self._client.build_request(method, url, timeout=timeout,
+                                                 extensions={"trace": trace}, **kwargs)
+            response = await self._client.send(request, stream=True)
+        except Exception as e:
+            raise _as_requests_error(e) from e
+
+        wrapped = AsyncResponse(response, self._loop, time.perf_counter() - started)
+        if "ended" in connect:
+            wrapped.connect_ms = (connect["ended"] - connect["started"]) * 1000
+        if stream:
+            wrapped._task = self._loop.create_task(wrapped._pump())
+            return wrapped
+        try:
+            wrapped._content = await response.aread()
+        except Exception as e:
+            raise _as_requests_error(e) from e
+        finally:
+            await response.aclose()
+        return wrapped
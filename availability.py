@@ -0,0 +1,190 @@
+import os
+import re
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from response_cache import is_mutating, normalize_prompt
+
+# Working hours shown in the week grid and searched for gaps
+AVAILABILITY_DAY_START = int(os.getenv("AVAILABILITY_DAY_START", "8"))
+AVAILABILITY_DAY_END = int(os.getenv("AVAILABILITY_DAY_END", "18"))
+# Grid resolution and default meeting length (minutes)
+SLOT_MINUTES = int(os.getenv("AVAILABILITY_SLOT_MINUTES", "30"))
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_NEXT_GAP = re.compile(r"\b(next|first|earliest)\b.*\b(gap|slot|opening|window|free|availab\w*)\b")
+_IS_FREE = re.compile(r"\b(free|available|availability|open|busy)\b")
+_DURATION = re.compile(r"\b(\d+)\s*(minutes?|mins?|m|hours?|hrs?|h)\b")
+_CLOCK = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b|\b(noon|midday)\b")
+_DAY = re.compile(r"\b(today|tomorrow|" + "|".join(WEEKDAYS) + r")\b")
+
+
+def _parse_time(value: str) -> datetime:
+    """ISO 8601 timestamp as a naive local datetime"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+class SlotIndex:
+    """Busy intervals for one window, merged and sorted so lookups are a bisect away"""
+
+    def __init__(self, busy: List[Tuple[datetime, datetime]], window_start: datetime, window_end: datetime):
+        self.window_start = window_start
+        self.window_end = window_end
+        self._starts = []
+        self._ends = []
+        for start, end in sorted(busy):
+            start, end = max(start, window_start), min(end, window_end)
+            if end <= start:
+                continue
+            if self._ends and start <= self._ends[-1]:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    @classmethod
+    def from_payload(cls, payload: Dict, window_start: datetime, window_end: datetime) -> "SlotIndex":
+        """Build from {"busy": [{"start", "end"}...]}, or the complement of {"free": [...]}"""
+        if "busy" in payload:
+            busy = [(_parse_time(item["start"]), _parse_time(item["end"])) for item in payload["busy"]]
+            return cls(busy, window_start, window_end)
+        free = cls([(_parse_time(item["start"]), _parse_time(item["end"])) for item in payload.get("free", [])],
+                   window_start, window_end)
+        return cls(list(free.free_intervals(window_start, window_end)), window_start, window_end)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        """Whether the loaded window spans [start, end), so the index can answer for it"""
+        return self.window_start <= start and end <= self.window_end
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        # First busy interval ending after start; free if it doesn't begin before end
+        i = bisect_right(self._ends, start)
+        return i == len(self._starts) or self._starts[i] >= end
+
+    def free_intervals(self, start: datetime, end: datetime) -> Iterator[Tuple[datetime, datetime]]:
+        """Gaps between busy intervals inside [start, end)"""
+        cursor = start
+        i = bisect_right(self._ends, start)
+        while cursor < end:
+            if i == len(self._starts) or self._starts[i] >= end:
+                yield cursor, end
+                return
+            if self._starts[i] > cursor:
+                yield cursor, self._starts[i]
+            cursor = max(cursor, self._ends[i])
+            i += 1
+
+    def working_hours(self, day: date) -> Tuple[datetime, datetime]:
+        midnight = datetime.combine(day, datetime.min.time())
+        return (midnight + timedelta(hours=AVAILABILITY_DAY_START),
+                midnight + timedelta(hours=AVAILABILITY_DAY_END))
+
+    def next_gap(self, after: datetime, minutes: int = SLOT_MINUTES) -> Optional[datetime]:
+        """Start of the first free stretch of at least minutes within working hours, after the given time"""
+        length = timedelta(minutes=minutes)
+        day = max(after, self.window_start).date()
+        while datetime.combine(day, datetime.min.time()) < self.window_end:
+            day_start, day_end = self.working_hours(day)
+            for start, end in self.free_intervals(max(day_start, after), min(day_end, self.window_end)):
+                if end - start >= length:
+                    return start
+            day += timedelta(days=1)
+        return None
+
+    def free_slots(self, day: date, minutes: int = SLOT_MINUTES) -> List[Tuple[datetime, datetime]]:
+        """Free stretches of at least minutes within working hours on day"""
+        day_start, day_end = self.working_hours(day)
+        length = timedelta(minutes=minutes)
+        return [(start, end) for start, end in self.free_intervals(day_start, day_end) if end - start >= length]
+
+    def week_grid(self, week_start: date, slot_minutes: int = SLOT_MINUTES) -> List[Dict[str, str]]:
+        """One row per slot of the working day, one column per weekday, ✅ free / ⛔ busy"""
+        step = timedelta(minutes=slot_minutes)
+        days = [week_start + timedelta(days=i) for i in range(7)]
+        rows = []
+        slot, day_end = self.working_hours(week_start)
+        while slot < day_end:
+            row = {"Time": slot.strftime("%H:%M")}
+            for day in days:
+                start = datetime.combine(day, slot.time())
+                if not self.covers(start, start + step):
+                    row[day.strftime("%a %d")] = ""
+                else:
+                    row[day.strftime("%a %d")] = "✅" if self.is_free(start, start + step) else "⛔"
+            rows.append(row)
+            slot += step
+        return rows
+
+
+def _parse_day(text: str, now: datetime) -> Optional[date]:
+    match = _DAY.search(text)
+    if match is None:
+        return None
+    word = match.group(1)
+    if word == "today":
+        return now.date()
+    if word == "tomorrow":
+        return now.date() + timedelta(days=1)
+    return now.date() + timedelta(days=(WEEKDAYS.index(word) - now.weekday()) % 7)
+
+
+def _parse_clock(text: str) -> Optional[Tuple[int, int]]:
+    match = _CLOCK.search(text)
+    if match is None:
+        return None
+    hour12, minute12, meridiem, hour24, minute24, noon = match.groups()
+    if noon:
+        return 12, 0
+    if meridiem:
+        hour = int(hour12) % 12 + (12 if meridiem == "pm" else 0)
+        return (hour, int(minute12 or 0)) if hour < 24 else None
+    hour, minute = int(hour24), int(minute24)
+    return (hour, minute) if hour < 24 and minute < 60 else None
+
+
+def _parse_minutes(text: str) -> int:
+    match = _DURATION.search(text)
+    if match is None:
+        return SLOT_MINUTES
+    amount, unit = int(match.group(1)), match.group(2)
+    return amount * 60 if unit.startswith("h") else amount
+
+
+def answer_locally(prompt: str, index: SlotIndex, now: datetime = None) -> Optional[str]:
+    """Answer "is 3 PM free?" / "next 30-minute gap" from the loaded slots; None if the backend should answer"""
+    text = normalize_prompt(prompt)
+    if is_mutating(text):
+        return None
+    now = now or datetime.now()
+    minutes = _parse_minutes(text)
+    length = timedelta(minutes=minutes)
+
+    if _NEXT_GAP.search(text):
+        day = _parse_day(text, now)
+        after = max(now, datetime.combine(day, datetime.min.time())) if day else now
+        if not index.covers(after, after):
+            return None
+        start = index.next_gap(after, minutes)
+        if start is None:
+            return f"📅 No free {minutes}-minute gap in working hours before {index.window_end:%a %d %b}."
+        return f"📅 Next free {minutes}-minute gap: **{start:%a %d %b, %H:%M}–{start + length:%H:%M}**."
+
+    clock = _parse_clock(text)
+    if clock is None or not _IS_FREE.search(text):
+        return None
+    day = _parse_day(text, now) or now.date()
+    start = datetime.combine(day, datetime.min.time()).replace(hour=clock[0], minute=clock[1])
+    if not index.covers(start, start + length):
+        return None
+    if index.is_free(start, start + length):
+        return f"✅ {start:%a %d %b, %H:%M}–{start + length:%H:%M} is free."
+    nearby = index.next_gap(start, minutes)
+    suggestion = f" The next free {minutes} minutes start at {nearby:%a %H:%M}." if nearby else ""
+    return f"⛔ {start:%a %d %b, %H:%M}–{start + length:%H:%M} is busy.{suggestion}"
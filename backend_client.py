@@ -0,0 +1,303 @@
+import streamlit as st
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from dotenv import load_dotenv
+import os
+import time
+
+from async_client import ASYNC_ENABLED, AsyncHTTPClient
+from load_balancer import LoadBalancer, Replica
+from metrics import MetricsCollector, TurnTimer, add_connect_time, get_metrics, reset_connect_time, take_connect_time
+from wire_format import (
+    ACCEPT_ENCODING, MSGPACK_ENABLED, MSGPACK_TYPES, STRUCTURED_ACCEPT,
+    content_type, decode_body, loads_json
+)
+from resilience import (
+    HEDGE_URL, MAX_RETRIES, CircuitBreaker, CircuitOpenError,
+    backoff_delay, hedged_call, is_retryable_error, is_retryable_status
+)
+
+# Load environment variables
+load_dotenv()
+# Get backend URL from environment variable
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")  # Default to localhost if not set
+# BACKEND_URL may list several replicas separated by commas
+BACKEND_URLS = [url.strip().rstrip("/") for url in BACKEND_URL.split(",") if url.strip()]
+
+# Connection pool and timeout settings (seconds)
+POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "20"))
+CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "120"))
+HEALTH_READ_TIMEOUT = float(os.getenv("BACKEND_HEALTH_TIMEOUT", "5"))
+# Ask the backend to stream /chat replies (falls back to plain JSON if unsupported)
+STREAMING_ENABLED = os.getenv("BACKEND_STREAMING", "1") not in ("0", "false", "False")
+STREAM_ACCEPT = "text/event-stream, application/x-ndjson;q=0.9, " + (
+    "application/msgpack;q=0.8, application/json;q=0.7" if MSGPACK_ENABLED else "application/json;q=0.8"
+)
+# Structured free/busy endpoint: GET ?start=&end= (ISO 8601) -> {"busy": [{"start", "end"}, ...]}
+AVAILABILITY_PATH = os.getenv("BACKEND_AVAILABILITY_PATH", "/availability")
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_connect_time((time.perf_counter() - started) * 1000)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_connect_time((time.perf_counter() - started) * 1000)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report DNS + connect (+ TLS) time to the metrics thread-local"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Create the pooled keep-alive session shared by every script run in this worker"""
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Content-Type": "application/json",
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive"
+    })
+    return session
+
+
+def chat_timeout():
+    """Connect/read timeout for /chat calls"""
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def health_timeout():
+    """Connect/read timeout for /health probes"""
+    return (CONNECT_TIMEOUT, HEALTH_READ_TIMEOUT)
+
+
+def iter_stream_tokens(response: requests.Response, timer: TurnTimer = None):
+    """Yield reply text from a streamed /chat response (SSE, NDJSON, plain chunks or single JSON)"""
+    token_from_payload = timer.timed_decode(_token_from_payload) if timer else _token_from_payload
+    kind = content_type(response)
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        # requests assumes ISO-8859-1 for text/* without a charset
+        response.encoding = "utf-8"
+
+    if kind == "application/json" or kind in MSGPACK_TYPES:
+        # Backend without streaming support: whole reply in one body
+        yield (timer.timed_decode(decode_body) if timer else decode_body)(response)["response"]
+        return
+
+    if kind == "text/event-stream":
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:]
+            if data.startswith(" "):
+                data = data[1:]
+            if data == "[DONE]":
+                return
+            yield token_from_payload(data)
+        return
+
+    if kind in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield token_from_payload(line.lstrip("\x1e"))
+        return
+
+    # Plain chunked text
+    for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+        if chunk:
+            yield chunk
+
+
+def _token_from_payload(data: str) -> str:
+    """Extract the text delta from one SSE/NDJSON event"""
+    try:
+        payload = loads_json(data)
+    except ValueError:
+        return data
+    if not isinstance(payload, dict):
+        return str(payload)
+    for key in ("token", "delta", "content", "response"):
+        if key in payload:
+            return payload[key] or ""
+    return ""
+
+
+class ReplyFailed(Exception):
+    """A reply that could not be fetched, or broke off part way; str() is the notice to show instead"""
+
+
+def failure_notice(error: Exception) -> str:
+    """What to show the user in place of (or after) a reply that failed with error"""
+    return str(error) if isinstance(error, ReplyFailed) else f"⚠️ Error: {str(error)}"
+
+
+class BackendClient:
+    """Pooled session plus load balancing, retries, circuit breaker and optional hedging for /chat
+
+    Requests go out through http: the requests session itself, or an AsyncHTTPClient
+    with the same get/post API that multiplexes them on one event loop.
+    """
+
+    def __init__(self, session: requests.Session, balancer: LoadBalancer = None,
+                 hedge_url: str = HEDGE_URL, breaker: CircuitBreaker = None,
+                 metrics: MetricsCollector = None, http=None):
+        self.session = session
+        self.http = http or session
+        self.metrics = metrics or MetricsCollector()
+        self.balancer = balancer or LoadBalancer(BACKEND_URLS)
+        self.hedge_replica = Replica(hedge_url) if hedge_url else None
+        self.breaker = breaker or CircuitBreaker()
+
+    def open_chat(self, payload: dict, headers: dict = None, stream: bool = False,
+                  idempotent: bool = False, affinity_key: str = None,
+                  timer: TurnTimer = None) -> requests.Response:
+        """POST /chat and return the response once headers arrive, retrying only when it is safe"""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(
+                    f"Backend temporarily unavailable (circuit open, retrying in {self.breaker.retry_in():.0f}s)"
+                )
+            try:
+                response = self._post_chat(payload, headers, stream, idempotent, affinity_key, timer)
+            except Exception as e:
+                self.breaker.record_failure()
+                self.metrics.incr("backend_errors")
+                if attempt >= MAX_RETRIES or not is_retryable_error(e, idempotent):
+                    raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                self.metrics.incr("backend_errors")
+                if attempt >= MAX_RETRIES or not is_retryable_status(response.status_code, idempotent):
+                    return response
+                response.close()
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            self.metrics.incr("backend_retries")
+
+    def fetch_availability(self, start: str, end: str) -> dict:
+        """GET machine-readable free/busy intervals for [start, end); raises on HTTP errors"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                f"Backend temporarily unavailable (circuit open, retrying in {self.breaker.retry_in():.0f}s)"
+            )
+        replica = self.balancer.pick()
+        self.balancer.acquire(replica)
+        started = time.perf_counter()
+        try:
+            response = self.http.get(
+                f"{replica.url}{AVAILABILITY_PATH}",
+                params={"start": start, "end": end},
+                headers={"Accept": STRUCTURED_ACCEPT},
+                timeout=chat_timeout()
+            )
+        except Exception:
+            self.balancer.release(replica, ok=False)
+            self.breaker.record_failure()
+            raise
+        ok = response.status_code < 500
+        self.balancer.release(replica, time.perf_counter() - started, ok)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        response.raise_for_status()
+        return decode_body(response)
+
+    def _post_chat(self, payload: dict, headers: dict, stream: bool, idempotent: bool,
+                   affinity_key: str, timer: TurnTimer) -> requests.Response:
+        primary = self.balancer.pick(affinity_key)
+        # Never hedge a booking: two replicas could both act on it
+        if idempotent:
+            hedge = self.hedge_replica
+            if hedge is None and len(self.balancer.urls) > 1:
+                hedge = self.balancer.pick(exclude=primary.url)
+            if hedge is not None and hedge.url != primary.url:
+                return hedged_call(
+                    lambda: self._post_to(primary, payload, headers, stream, timer),
+                    lambda: self._post_to(hedge, payload, headers, stream, timer)
+                )
+        return self._post_to(primary, payload, headers, stream, timer)
+
+    def _post_to(self, replica: Replica, payload: dict, headers: dict, stream: bool,
+                 timer: TurnTimer = None) -> requests.Response:
+        """POST to one replica, counting it as outstanding until the response is closed"""
+        self.balancer.acquire(replica)
+        reset_connect_time()
+        started = time.perf_counter()
+        try:
+            response = self.http.post(
+                f"{replica.url}/chat",
+                json=payload,
+                headers=headers,
+                timeout=chat_timeout(),
+                stream=stream
+            )
+        except Exception:
+            self.balancer.release(replica, ok=False)
+            raise
+        finally:
+            connect_ms = take_connect_time()
+            if timer is not None:
+                timer.connect_ms += connect_ms
+
+        latency = time.perf_counter() - started
+        ok = response.status_code < 500
+        if not stream:
+            self.balancer.release(replica, latency, ok)
+            return response
+
+        # Streamed bodies keep the replica busy until the caller closes the response
+        close = response.close
+        released = []
+
+        def close_and_release():
+            if not released:
+                released.append(True)
+                self.balancer.release(replica, latency, ok)
+            close()
+
+        response.close = close_and_release
+        return response
+
+
+@st.cache_resource
+def get_backend_client() -> BackendClient:
+    """Backend client shared by every session in this worker"""
+    session = get_session()
+    http = AsyncHTTPClient(dict(session.headers), POOL_SIZE) if ASYNC_ENABLED else None
+    return BackendClient(session, metrics=get_metrics(), http=http)
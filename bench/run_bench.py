@@ -0,0 +1,270 @@
+"""Headless load/regression benchmark for streamlit_app.py.
+
+Drives the app through Streamlit's AppTest against bench/stub_backend.py and
+reports rerun time, memory per session and request throughput for:
+
+    history       one session growing its chat history turn by turn
+    quick_burst   many sessions hammering the quick-action buttons at once
+    backend_down  sessions chatting while the backend refuses connections
+
+    python bench/run_bench.py                       # all scenarios, default sizes
+    python bench/run_bench.py --scenario history --turns 300
+    python bench/run_bench.py --json bench_output.json
+
+Each scenario runs in its own subprocess so worker-wide caches (HTTP client,
+health monitor, response cache) start cold and memory numbers don't leak
+between scenarios. AppTest is not thread-safe, so concurrent sessions are
+interleaved on one thread: every session submits its turn, then all of them
+poll until their replies land, while the app's shared executor runs the
+backend calls in parallel. memory_per_session is tracemalloc growth divided by
+the session count, so it includes AppTest's own element tree: compare it
+between runs rather than reading it as production RSS.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "streamlit_app.py")
+SCENARIOS = ("history", "quick_burst", "backend_down")
+QUICK_ACTIONS = 5
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.999999) - 1))]
+
+
+class Session:
+    """One simulated browser tab"""
+
+    def __init__(self, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(APP, default_timeout=timeout)
+        self.rerun_ms = []
+        self.turn_ms = []
+        self._turn_started = None
+        self.run()
+
+    def run(self):
+        started = time.perf_counter()
+        self.app.run()
+        self.rerun_ms.append((time.perf_counter() - started) * 1000)
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].message)
+
+    def start_send(self, text: str):
+        self._turn_started = time.perf_counter()
+        self.app.text_input(key="chat_input").input(text)
+        next(b for b in self.app.button if str(b.label).startswith("Send")).click()
+        self.run()
+
+    def start_quick_action(self, index: int):
+        self._turn_started = time.perf_counter()
+        self.app.button(key=f"quick_{index}").click()
+        self.run()
+
+    def poll(self) -> bool:
+        """Rerun like the pending-reply fragment would; True once the turn has landed"""
+        state = self.app.session_state
+        if state["pending_job"] is not None or state["queued_prompts"]:
+            self.run()
+            if state["pending_job"] is not None or state["queued_prompts"]:
+                return False
+        if self._turn_started is not None:
+            self.turn_ms.append((time.perf_counter() - self._turn_started) * 1000)
+            self._turn_started = None
+        return True
+
+    def send(self, text: str, poll: float):
+        self.start_send(text)
+        wait_all([self], poll)
+
+
+def wait_all(sessions, poll: float, limit: float = 120):
+    deadline = time.monotonic() + limit
+    pending = list(sessions)
+    while pending:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{len(pending)} replies did not arrive")
+        pending = [session for session in pending if not session.poll()]
+        if pending:
+            time.sleep(poll)
+
+
+def stub_stats(url: str) -> dict:
+    import requests
+
+    return requests.get(f"{url}/stats", timeout=5).json()
+
+
+def scenario_history(args) -> dict:
+    session = Session(args.timeout)
+    per_turn_rerun = []
+    for i in range(args.turns):
+        before = len(session.rerun_ms)
+        session.send(f"Check availability for slot {i}", args.poll)
+        per_turn_rerun.append(sum(session.rerun_ms[before:]) / max(1, len(session.rerun_ms) - before))
+
+    head = per_turn_rerun[:max(1, len(per_turn_rerun) // 10)]
+    tail = per_turn_rerun[-max(1, len(per_turn_rerun) // 10):]
+    head_ms = sum(head) / len(head)
+    tail_ms = sum(tail) / len(tail)
+    return {
+        "turns": args.turns,
+        "rerun_p50_ms": percentile(session.rerun_ms, 0.5),
+        "rerun_p95_ms": percentile(session.rerun_ms, 0.95),
+        "rerun_first_10pct_ms": head_ms,
+        "rerun_last_10pct_ms": tail_ms,
+        "rerun_growth": tail_ms / head_ms if head_ms else 0.0,
+        "turn_p50_ms": percentile(session.turn_ms, 0.5),
+        "turn_p95_ms": percentile(session.turn_ms, 0.95),
+    }
+
+
+def run_sessions(args, start_turn) -> dict:
+    """Create args.sessions sessions; each round every session starts a turn, then all wait"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sessions = [Session(args.timeout) for _ in range(args.sessions)]
+    memory_per_session = (tracemalloc.get_traced_memory()[0] - baseline) / len(sessions)
+
+    errors = []
+    started = time.perf_counter()
+    for round_index in range(args.clicks):
+        for index, session in enumerate(sessions):
+            try:
+                start_turn(session, index, round_index)
+            except Exception as e:
+                errors.append(repr(e))
+        try:
+            wait_all(sessions, args.poll)
+        except TimeoutError as e:
+            errors.append(repr(e))
+    elapsed = time.perf_counter() - started
+    memory_after = (tracemalloc.get_traced_memory()[0] - baseline) / len(sessions)
+    tracemalloc.stop()
+
+    rerun_ms = [ms for s in sessions for ms in s.rerun_ms]
+    turn_ms = [ms for s in sessions for ms in s.turn_ms]
+    return {
+        "sessions": len(sessions),
+        "turns": len(turn_ms),
+        "elapsed_s": elapsed,
+        "turns_per_s": len(turn_ms) / elapsed if elapsed else 0.0,
+        "rerun_p50_ms": percentile(rerun_ms, 0.5),
+        "rerun_p95_ms": percentile(rerun_ms, 0.95),
+        "turn_p50_ms": percentile(turn_ms, 0.5),
+        "turn_p95_ms": percentile(turn_ms, 0.95),
+        "memory_per_session_kb": memory_per_session / 1024,
+        "memory_per_session_after_kb": memory_after / 1024,
+        "errors": errors[:5],
+    }
+
+
+def scenario_quick_burst(args) -> dict:
+    def burst(session, index, round_index):
+        session.start_quick_action((index + round_index) % QUICK_ACTIONS)
+
+    result = run_sessions(args, burst)
+    stats = stub_stats(os.environ["BACKEND_URL"])
+    result["backend_requests"] = stats["chat_requests"]
+    result["backend_requests_per_s"] = stats["chat_requests"] / result["elapsed_s"] if result["elapsed_s"] else 0.0
+    result["health_probes"] = stats["health_requests"]
+    return result
+
+
+def scenario_backend_down(args) -> dict:
+    def chat(session, index, round_index):
+        session.start_send(f"Book a meeting at {round_index + 1} PM")
+
+    return run_sessions(args, chat)
+
+
+def run_child(args):
+    """Run one scenario in this process and print its result as JSON"""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(ROOT)
+    # The bench drives sessions far faster than a person would; keep the per-session limiter out of it
+    os.environ.setdefault("CHAT_RATE_PER_MINUTE", "0")
+    from stub_backend import StubConfig, start_stub
+
+    if args.scenario == "backend_down":
+        # Nothing listens on port 9 (discard); connections are refused straight away
+        os.environ["BACKEND_URL"] = "http://127.0.0.1:9"
+    else:
+        config = StubConfig(latency=args.latency, payload_bytes=args.payload_bytes, error_rate=args.error_rate)
+        server = start_stub(0, config)
+        os.environ["BACKEND_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    scenario = {"history": scenario_history, "quick_burst": scenario_quick_burst,
+                "backend_down": scenario_backend_down}[args.scenario]
+    print(json.dumps(scenario(args)))
+
+
+def format_report(results: dict) -> str:
+    lines = []
+    for name, result in results.items():
+        lines.append(f"== {name}")
+        if "error" in result:
+            lines.append(f"   FAILED: {result['error']}")
+            continue
+        for key, value in result.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            lines.append(f"   {key:<30} {value}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--turns", type=int, default=100, help="history: turns in the growing conversation")
+    parser.add_argument("--sessions", type=int, default=20, help="quick_burst/backend_down: concurrent sessions")
+    parser.add_argument("--clicks", type=int, default=5, help="quick_burst/backend_down: turns per session")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub /chat latency (s)")
+    parser.add_argument("--payload-bytes", type=int, default=400, help="stub reply size")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub 503 rate")
+    parser.add_argument("--poll", type=float, default=0.05, help="seconds between reruns while a reply is pending")
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest per-run timeout (s)")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    passthrough = [arg for arg in sys.argv[1:] if not arg.startswith("--scenario") and arg not in scenarios]
+    if "--json" in passthrough:
+        index = passthrough.index("--json")
+        del passthrough[index:index + 2]
+
+    results = {}
+    for name in scenarios:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--scenario", name] + passthrough,
+            capture_output=True, text=True, cwd=ROOT
+        )
+        try:
+            results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            results[name] = {"error": (completed.stderr.strip().splitlines() or ["no output"])[-1]}
+        print(format_report({name: results[name]}), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Stub CalendarAI backend for benchmarks.
+
+Implements /chat (JSON, or SSE when the request asks to stream), /health and
+/availability with configurable latency, payload size and error rate.
+
+    python bench/stub_backend.py --port 8000 --latency 0.2 --payload-bytes 800 --error-rate 0.05
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubConfig:
+    def __init__(self, latency=0.05, jitter=0.0, payload_bytes=400, error_rate=0.0,
+                 stream=True, tokens=20, health_latency=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_bytes = payload_bytes
+        self.error_rate = error_rate
+        self.stream = stream
+        self.tokens = tokens
+        self.health_latency = health_latency
+        self.lock = threading.Lock()
+        self.chat_requests = 0
+        self.health_requests = 0
+        self.errors = 0
+
+
+def _reply_text(prompt: str, size: int) -> str:
+    text = f"Here is what I found for '{prompt}'. "
+    filler = "Monday 9:00-10:00 is free. "
+    while len(text) < size:
+        text += filler
+    return text[:size]
+
+
+def _busy_slots(start: datetime, end: datetime) -> list:
+    """Deterministic weekday meetings: 9:00-10:00 standup and 14:00-15:30 review"""
+    busy = []
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        if day.weekday() < 5:
+            for begin, finish in ((9, 10), (14, 15.5)):
+                slot_start = day + timedelta(hours=begin)
+                slot_end = day + timedelta(hours=finish)
+                if slot_end > start and slot_start < end:
+                    busy.append({"start": slot_start.isoformat(), "end": slot_end.isoformat()})
+        day += timedelta(days=1)
+    return busy
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode()
+            gzipped = len(data) >= 256 and "gzip" in self.headers.get("Accept-Encoding", "")
+            if gzipped:
+                data = gzip.compress(data, compresslevel=5)
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/health":
+                with config.lock:
+                    config.health_requests += 1
+                time.sleep(config.health_latency)
+                self._send_json(200, {"status": "ok"})
+            elif self.path.startswith("/availability"):
+                query = parse_qs(urlsplit(self.path).query)
+                try:
+                    start = datetime.fromisoformat(query["start"][0])
+                    end = datetime.fromisoformat(query["end"][0])
+                except (KeyError, ValueError):
+                    self._send_json(422, {"detail": "start and end are required ISO timestamps"})
+                    return
+                self._send_json(200, {"busy": _busy_slots(start, end)})
+            elif self.path == "/stats":
+                with config.lock:
+                    stats = {"chat_requests": config.chat_requests,
+                             "health_requests": config.health_requests,
+                             "errors": config.errors}
+                self._send_json(200, stats)
+            else:
+                self._send_json(404, {"detail": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path != "/chat":
+                self._send_json(404, {"detail": "not found"})
+                return
+
+            with config.lock:
+                config.chat_requests += 1
+                failed = random.random() < config.error_rate
+                if failed:
+                    config.errors += 1
+            time.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+            if failed:
+                self._send_json(503, {"detail": "stub overloaded"})
+                return
+
+            reply = _reply_text(body.get("content", ""), config.payload_bytes)
+            # Context protocol: acknowledge the user turn and this reply as stored
+            ack = {"X-Context-Ack": str(body["turn"] + 2)} if "turn" in body else {}
+            if not (config.stream and body.get("stream")):
+                self._send_json(200, {"response": reply}, ack)
+                return
+
+            self.send_response(200)
+            for name, value in ack.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            step = max(1, len(reply) // max(1, config.tokens))
+            for i in range(0, len(reply), step):
+                self._write_chunk(f"data: {json.dumps({'token': reply[i:i + step]})}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stub(port: int = 0, config: StubConfig = None) -> ThreadingHTTPServer:
+    """Start the stub on a daemon thread; port 0 picks a free port (see server.server_port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-backend", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the reply starts")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to latency")
+    parser.add_argument("--payload-bytes", type=int, default=400, help="reply length in characters")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of /chat calls answered with 503")
+    parser.add_argument("--no-stream", action="store_true", help="always answer with a single JSON body")
+    parser.add_argument("--tokens", type=int, default=20, help="SSE events per streamed reply")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.payload_bytes, args.error_rate,
+                        not args.no_stream, args.tokens)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(config))
+    print(f"stub backend on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
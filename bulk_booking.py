@@ -0,0 +1,154 @@
+import csv
+import io
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List
+
+from backend_client import failure_notice
+from chat_executor import ChatExecutor
+
+# Booking requests in flight at once per batch (the backend only takes one request per /chat call)
+BULK_CONCURRENCY = int(os.getenv("BULK_BOOKING_CONCURRENCY", "4"))
+# Rows accepted per batch
+BULK_MAX_ROWS = int(os.getenv("BULK_BOOKING_MAX_ROWS", "200"))
+
+# A CSV column with one of these headers is taken as the request text as-is
+REQUEST_COLUMNS = ("request", "prompt", "message")
+# Headers that mark the first row as a header row for structured CSVs
+FIELD_COLUMNS = ("title", "subject", "date", "day", "time", "start", "end", "duration", "attendees", "with", "location")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"  # never sent because the batch was stopped
+# Rows that may be sent again; a DONE row already booked something
+RETRYABLE = (FAILED, SKIPPED)
+
+
+def parse_bulk_requests(text: str) -> List[str]:
+    """One booking request per non-empty line of a pasted list or CSV
+
+    A request/prompt/message column is used verbatim; other headed CSVs become
+    "Book title: ..., date: ..." prompts; headerless rows keep their cells in order.
+    """
+    rows = [[cell.strip() for cell in row] for row in csv.reader(io.StringIO(text))]
+    rows = [row for row in rows if any(row)]
+    if not rows:
+        return []
+    header = [cell.casefold() for cell in rows[0]]
+    for name in REQUEST_COLUMNS:
+        if name in header:
+            column = header.index(name)
+            return [row[column] for row in rows[1:] if len(row) > column and row[column]]
+    if len(header) > 1 and any(name in FIELD_COLUMNS for name in header):
+        return [
+            "Book " + ", ".join(f"{name}: {value}" for name, value in zip(header, row) if value)
+            for row in rows[1:]
+        ]
+    return [", ".join(cell for cell in row if cell) for row in rows]
+
+
+class BulkRow:
+    """One booking request in a batch"""
+
+    __slots__ = ("prompt", "status", "reply", "latency_ms")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.status = PENDING
+        self.reply = ""
+        self.latency_ms = 0.0
+
+
+class BulkJob:
+    """A batch of booking requests sent with bounded concurrency on the shared chat executor
+
+    Each finished row starts the next pending one, so a batch never holds more than
+    concurrency executor threads and never blocks one waiting for a slot.
+    """
+
+    def __init__(self, prompts: Iterable[str], send_fn: Callable[[str], str], executor: ChatExecutor,
+                 concurrency: int = BULK_CONCURRENCY):
+        self.rows = [BulkRow(prompt) for prompt in prompts]
+        self._send_fn = send_fn
+        self._executor = executor
+        self._concurrency = max(1, concurrency)
+        self._lock = threading.Lock()
+        self._pending = deque(range(len(self.rows)))
+        self._running = 0
+        self._start_more()
+
+    @property
+    def done(self) -> bool:
+        with self._lock:
+            return not self._running and not self._pending
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0, SKIPPED: 0}
+            for row in self.rows:
+                counts[row.status] += 1
+            return counts
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """Table rows for display"""
+        with self._lock:
+            return [
+                {"#": i + 1, "Request": row.prompt, "Status": row.status,
+                 "Reply": row.reply, "ms": round(row.latency_ms)}
+                for i, row in enumerate(self.rows)
+            ]
+
+    def retryable(self, indices: Iterable[int]) -> List[int]:
+        """The given rows that may be sent again (failed or skipped, never done or in flight)"""
+        with self._lock:
+            return [i for i in indices if self.rows[i].status in RETRYABLE]
+
+    def retry(self, indices: Iterable[int] = None):
+        """Queue failed rows (or the given failed/skipped ones) to be sent again; nothing else is sent"""
+        with self._lock:
+            if indices is None:
+                indices = [i for i, row in enumerate(self.rows) if row.status == FAILED]
+            for i in indices:
+                row = self.rows[i]
+                if row.status in RETRYABLE:
+                    row.status = PENDING
+                    row.reply = ""
+                    self._pending.append(i)
+        self._start_more()
+
+    def cancel(self):
+        """Send nothing more: unsent rows are marked skipped; requests already in flight still finish"""
+        with self._lock:
+            for i in self._pending:
+                self.rows[i].status = SKIPPED
+            self._pending.clear()
+
+    def _start_more(self):
+        while True:
+            with self._lock:
+                if not self._pending or self._running >= self._concurrency:
+                    return
+                index = self._pending.popleft()
+                self.rows[index].status = RUNNING
+                self._running += 1
+            self._executor.run(self._send, index)
+
+    def _send(self, index: int):
+        row = self.rows[index]
+        started = time.perf_counter()
+        status = DONE
+        try:
+            reply = self._send_fn(row.prompt)
+        except Exception as e:
+            reply = failure_notice(e)
+            status = FAILED
+        with self._lock:
+            row.reply = reply
+            row.latency_ms = (time.perf_counter() - started) * 1000
+            row.status = status
+            self._running -= 1
+        self._start_more()
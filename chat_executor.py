@@ -0,0 +1,203 @@
+import streamlit as st
+import threading
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+from backend_client import failure_notice
+
+# Worker threads shared by every session for in-flight /chat calls
+CHAT_WORKERS = int(os.getenv("CHAT_EXECUTOR_WORKERS", "32"))
+# Backend calls this process runs at once; the rest wait in line, and chats beyond the line are refused
+CHAT_MAX_CONCURRENT = int(os.getenv("CHAT_MAX_CONCURRENT", str(CHAT_WORKERS)))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing a chat when this process already has a full line"""
+
+
+class ChatJob:
+    """Handle for one /chat call running on the shared executor"""
+
+    def __init__(self, prompt: str, on_done: Callable[["ChatJob"], None] = None):
+        self.prompt = prompt
+        self.on_done = on_done  # called on the worker once the reply has finished (or failed)
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._failed = False
+        self._result = None
+        self._response = None
+        self._cancelled = threading.Event()
+        self._started = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def text(self) -> str:
+        """Reply text received so far"""
+        with self._lock:
+            return "".join(self._chunks)
+
+    @property
+    def failed(self) -> bool:
+        """True when the reply broke off with an error; text then ends with the notice, never a full answer"""
+        with self._lock:
+            return self._failed
+
+    def wait_started(self, timeout: float = None) -> bool:
+        """Wait until a worker picks the job up (it may still be waiting for the backend)"""
+        return self._started.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def attach(self, response):
+        """Remember the open HTTP response so cancel() can abort it"""
+        with self._lock:
+            self._response = response
+        if self.cancelled:
+            response.close()
+
+    def append(self, token: str):
+        with self._lock:
+            self._chunks.append(token)
+
+    def fail(self, notice: str):
+        with self._lock:
+            self._failed = True
+            self._chunks.append(f"\n\n{notice}" if self._chunks else notice)
+
+    def cancel(self):
+        """Stop waiting for the reply and close the underlying HTTP response"""
+        self._cancelled.set()
+        with self._lock:
+            response = self._response
+        if response is not None:
+            response.close()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def settle(self, result):
+        """Record what became of the reply if nobody has yet; returns whichever result was recorded first"""
+        with self._lock:
+            if self._result is None:
+                self._result = result
+            return self._result
+
+    def _begin(self):
+        self._started.set()
+
+    def _finish(self):
+        self._done.set()
+
+
+class ChatExecutor:
+    """Thread pool that runs chat calls off the Streamlit script thread
+
+    At most max_concurrent calls run at once; later ones wait in a FIFO line,
+    and new chats are refused outright once max_queue are already waiting.
+    """
+
+    def __init__(self, max_workers: int = CHAT_WORKERS, max_concurrent: int = CHAT_MAX_CONCURRENT,
+                 max_queue: int = CHAT_MAX_QUEUE):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat")
+        self._max_concurrent = max(1, max_concurrent)
+        self._max_queue = max_queue
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = deque()  # (job or None, fn, args)
+
+    def submit(self, prompt: str, stream_fn: Callable[..., Iterator[str]],
+               on_done: Callable[[ChatJob], None] = None) -> ChatJob:
+        """Start (or line up) streaming a reply for prompt and return its handle immediately"""
+        job = ChatJob(prompt, on_done)
+        self._start(job, self._run, job, stream_fn)
+        return job
+
+    def submit_background(self, prompt: str, stream_fn: Callable[..., Iterator[str]]) -> ChatJob:
+        """Like submit, but never refused or counted in the line: for speculative work that checked load() first"""
+        job = ChatJob(prompt)
+        self._start(None, self._run, job, stream_fn)
+        return job
+
+    def run(self, fn: Callable, *args):
+        """Run fn(*args) under the same concurrency cap (never refused; callers bound their own load)"""
+        self._start(None, fn, *args)
+
+    def position(self, job: ChatJob) -> int:
+        """1-based place of job in the line, or 0 once it is running"""
+        with self._lock:
+            position = 0
+            for waiting, _, _ in self._waiting:
+                if waiting is None or not waiting.cancelled:
+                    position += 1
+                if waiting is job:
+                    return position
+        return 0
+
+    def load(self) -> dict:
+        with self._lock:
+            return {"active": self._active, "waiting": len(self._waiting), "limit": self._max_concurrent}
+
+    def _start(self, job, fn: Callable, *args):
+        with self._lock:
+            if self._active >= self._max_concurrent:
+                if job is not None and len(self._waiting) >= self._max_queue:
+                    raise AdmissionRejected("The assistant is at capacity right now, please try again shortly")
+                self._waiting.append((job, fn, args))
+                return
+            self._active += 1
+        self._pool.submit(self._call, fn, args)
+
+    def _call(self, fn: Callable, args):
+        try:
+            fn(*args)
+        finally:
+            self._next()
+
+    def _next(self):
+        """A call finished: hand its slot to the next live entry in line"""
+        while True:
+            with self._lock:
+                if not self._waiting:
+                    self._active -= 1
+                    return
+                job, fn, args = self._waiting.popleft()
+            if job is not None and job.cancelled:
+                job._finish()
+                continue
+            self._pool.submit(self._call, fn, args)
+            return
+
+    @staticmethod
+    def _run(job: ChatJob, stream_fn: Callable[..., Iterator[str]]):
+        job._begin()
+        try:
+            if job.cancelled:
+                return
+            for token in stream_fn(job.prompt, on_response=job.attach):
+                if job.cancelled:
+                    break
+                job.append(token)
+        except Exception as e:
+            if not job.cancelled:
+                job.fail(failure_notice(e))
+        finally:
+            try:
+                if job.on_done is not None and not job.cancelled:
+                    job.on_done(job)
+            finally:
+                job._finish()
+
+
+@st.cache_resource
+def get_chat_executor() -> ChatExecutor:
+    """Chat executor shared by every session in this worker"""
+    return ChatExecutor()
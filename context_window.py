@@ -0,0 +1,148 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional
+
+from conversation_store import CHAT_RETENTION_DAYS, ChatMessage, ConversationStore
+from shared_state import SharedState
+
+# Send conversation id, turn number and unacknowledged history with every /chat call
+CONTEXT_SYNC_ENABLED = os.getenv("CHAT_CONTEXT_SYNC", "1") not in ("0", "false", "False")
+# Rough token budget for the history sent with one turn (prompt excluded)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+# Part of the budget spent summarising messages that no longer fit
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_SUMMARY_TOKENS", "200"))
+# Never look further back than this many messages, whatever the backend has acknowledged
+MAX_CONTEXT_MESSAGES = 50
+# Response header carrying how many messages of the conversation the backend has stored
+ACK_HEADER = "X-Context-Ack"
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token, close enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+def _summarize(messages: List[ChatMessage], budget: int) -> str:
+    """Extractive summary of dropped messages: the start of each user prompt, as many of the newest as fit"""
+    parts = []
+    used = estimate_tokens("Earlier in this conversation the user asked: ")
+    for message in reversed(messages):
+        if not message.is_user:
+            continue
+        line = " ".join(message.content.split())[:80]
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        parts.append(line)
+        used += cost
+    if not parts:
+        return ""
+    return "Earlier in this conversation the user asked: " + "; ".join(reversed(parts))
+
+
+class ContextSync:
+    """What the backend has acknowledged for one conversation, and the delta each new turn carries
+
+    Turn numbers are positions in the conversation, so they only ever grow. The backend
+    answers with X-Context-Ack: <messages stored>; anything after that is resent, trimmed
+    to the token budget so the request size stays flat however long the chat gets.
+    Local messages (the frontend's own notices and answers) keep their positions but
+    are never sent: the backend didn't write them.
+
+    With a shared state the acknowledgement is stored there too, so a conversation resumed
+    on another worker carries on with a delta instead of resending its history.
+    """
+
+    def __init__(self, conversation_id: str, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 summary_budget: int = SUMMARY_TOKEN_BUDGET, shared: SharedState = None):
+        self.conversation_id = conversation_id
+        self._token_budget = token_budget
+        self._summary_budget = min(summary_budget, token_budget)
+        self._shared = shared if shared is not None and shared.shared else None
+        self._lock = threading.Lock()
+        self._acked = 0
+        if self._shared is not None:
+            try:
+                self._acked = int(self._shared.get(self._shared_key) or 0)
+            except Exception:
+                pass  # worst case the next turn resends more history
+
+    @property
+    def acked(self) -> int:
+        with self._lock:
+            return self._acked
+
+    def ack(self, value: Optional[str]):
+        """Apply the backend's acknowledgement; it is authoritative, so it may also move back"""
+        try:
+            acked = int(value)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._acked = max(0, acked)
+        self._store(max(0, acked))
+
+    @property
+    def _shared_key(self) -> str:
+        return f"ctx-ack:{self.conversation_id}"
+
+    def _store(self, acked: int):
+        if self._shared is None:
+            return
+        try:
+            self._shared.set(self._shared_key, str(acked), CHAT_RETENTION_DAYS * 86400)
+        except Exception:
+            pass
+
+    def build(self, conversation: ConversationStore) -> Dict:
+        """Context fields for the turn whose user message was just appended to conversation"""
+        turn = len(conversation) - 1
+        start = max(min(self.acked, turn), turn - MAX_CONTEXT_MESSAGES)
+        pending = [(seq, message) for seq, message in enumerate(conversation.slice(start, turn), start)
+                   if not message.local]
+
+        costs = [estimate_tokens(message.content) for _, message in pending]
+        keep = len(pending)
+        if sum(costs) > self._token_budget:
+            # Keep the newest messages that fit, leaving room for a summary of the rest
+            budget = self._token_budget - self._summary_budget
+            used = keep = 0
+            for cost in reversed(costs):
+                if used + cost > budget:
+                    break
+                used += cost
+                keep += 1
+        dropped, kept = pending[:len(pending) - keep], pending[len(pending) - keep:]
+        if not dropped:
+            first = start
+        else:
+            first = kept[0][0] if kept else turn
+
+        context = {
+            "conversation_id": self.conversation_id,
+            "turn": turn,
+            "context_from": first,
+            "context": [{"seq": seq, "role": message.role.value, "content": message.content}
+                        for seq, message in kept],
+        }
+        if first > self.acked:
+            # The backend is missing messages [acked, first): say so and summarise what we have of them
+            context["summary"] = _summarize([message for _, message in dropped], self._summary_budget)
+        return context
+
+
+def context_digest(context: Optional[Dict]) -> str:
+    """Stable fingerprint of the history a reply depends on (turn numbers excluded)
+
+    The conversation id is part of it: once earlier turns are acked the delta is empty,
+    and the reply then depends on history only the backend holds for that conversation.
+    """
+    if not context:
+        return ""
+    digest = hashlib.sha1(context["conversation_id"].encode())
+    for item in context["context"]:
+        digest.update(item["role"].encode())
+        digest.update(item["content"].encode())
+    digest.update(context.get("summary", "").encode())
+    return digest.hexdigest()
@@ -0,0 +1,271 @@
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import List, Optional
+
+from streamlit.logger import get_logger
+
+from shared_state import is_cross_process, shared_sqlite_path, sqlite_journal_pragma
+
+# Messages kept in memory per session; older ones are read back from the store on demand
+MEMORY_LIMIT = int(os.getenv("CHAT_MEMORY_LIMIT", "100"))
+# SQLite file holding every conversation; point it at a persistent volume to survive pod restarts.
+# Defaults to the shared-state file when SHARED_STATE_URL is sqlite, so every worker sees every conversation
+CHAT_DB_PATH = os.getenv("CHAT_DB_PATH", shared_sqlite_path()
+                         or os.path.join(tempfile.gettempdir(), "calendarai_conversations.sqlite3"))
+if is_cross_process() and "CHAT_DB_PATH" not in os.environ and shared_sqlite_path() is None:
+    # A worker-local history file would make resumed sessions come back empty on the other pods
+    raise RuntimeError("SHARED_STATE_URL shares state between workers but conversation history would stay "
+                       "in a local file: set CHAT_DB_PATH to a database on a volume every worker mounts")
+# Conversations untouched for this many days are pruned when a worker first opens the file
+CHAT_RETENTION_DAYS = float(os.getenv("CHAT_RETENTION_DAYS", "30"))
+# Messages loaded when a conversation is resumed; the rest load page by page
+RESUME_PAGE = int(os.getenv("CHAT_RESUME_PAGE", "40"))
+# Rows written per transaction at most
+WRITE_BATCH_SIZE = 200
+
+_CONVERSATION_ID = re.compile(r"^[0-9a-f]{32}$")
+logger = get_logger("calendarai.conversations")
+_writers_lock = threading.Lock()
+_writers = {}
+
+
+class Role(str, Enum):
+    USER = "user"
+    ASSISTANT = "assistant"
+
+
+@dataclass(frozen=True, slots=True)
+class ChatMessage:
+    """One chat turn; compact enough to keep hundreds per session"""
+    role: Role
+    content: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: float = field(default_factory=time.time)
+    local: bool = False  # written by the frontend (a notice, or an answer from loaded slots), not the backend
+
+    @property
+    def is_user(self) -> bool:
+        return self.role is Role.USER
+
+
+def new_conversation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_conversation_id(value: Optional[str]) -> bool:
+    return bool(value) and bool(_CONVERSATION_ID.match(value))
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute(sqlite_journal_pragma())
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _Writer:
+    """One background thread per database file that applies queued writes in batches, in order"""
+
+    def __init__(self, path: str):
+        self._queue = queue.Queue()
+        conn = _connect(path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                conversation_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                local INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (conversation_id, seq)
+            )
+        """)
+        if "local" not in {row[1] for row in conn.execute("PRAGMA table_info(messages)")}:
+            # Files written before messages could be local
+            conn.execute("ALTER TABLE messages ADD COLUMN local INTEGER NOT NULL DEFAULT 0")
+        # Conversations nobody came back to; keyed on their newest message
+        conn.execute("""
+            DELETE FROM messages WHERE conversation_id IN (
+                SELECT conversation_id FROM messages GROUP BY conversation_id HAVING MAX(created_at) < ?
+            )
+        """, (time.time() - CHAT_RETENTION_DAYS * 86400,))
+        conn.commit()
+        threading.Thread(target=self._run, args=(conn,), name="conversation-writer", daemon=True).start()
+
+    def insert(self, row: tuple):
+        self._queue.put(("insert", row))
+
+    def delete(self, conversation_id: str):
+        self._queue.put(("delete", conversation_id))
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far is committed"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait(timeout)
+
+    def _run(self, conn: sqlite3.Connection):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for op, arg in batch:
+                        if op == "insert":
+                            # seq is taken here, in the write transaction, so two tabs (or pods)
+                            # appending to one conversation never claim the same position
+                            conn.execute(
+                                "INSERT INTO messages (conversation_id, seq, id, role, content, created_at, local) "
+                                "SELECT ?, COALESCE(MAX(seq) + 1, 0), ?, ?, ?, ?, ? "
+                                "FROM messages WHERE conversation_id = ?",
+                                arg + (arg[0],)
+                            )
+                        elif op == "delete":
+                            conn.execute("DELETE FROM messages WHERE conversation_id = ?", (arg,))
+            except sqlite3.Error as e:
+                logger.warning("dropped %d conversation writes: %s", len(batch), e)
+            for op, arg in batch:
+                if op == "flush":
+                    arg.set()
+
+
+def _writer(path: str) -> _Writer:
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = _Writer(path)
+        return writer
+
+
+class ConversationStore:
+    """Persistent conversation with a bounded in-memory tail
+
+    Every message is written to SQLite by a background writer, which also assigns its
+    position. Resuming a conversation loads only its latest page; older messages are
+    read back on demand. Another tab (or pod) may append to the same conversation, so
+    each append checks the position it was given and reloads the tail if that moved.
+    """
+
+    def __init__(self, session_id: str, memory_limit: int = MEMORY_LIMIT, db_path: str = CHAT_DB_PATH,
+                 resume_page: int = RESUME_PAGE):
+        self.session_id = session_id
+        self._memory_limit = max(1, memory_limit)
+        self._db_path = db_path
+        self._writer = _writer(db_path)
+        self._recent = deque()
+        self._offset = 0  # position of self._recent[0] in the whole conversation
+        self._resume_page = max(1, min(resume_page, self._memory_limit))
+        self._resume(self._resume_page)
+
+    def __len__(self) -> int:
+        return self._offset + len(self._recent)
+
+    def append(self, role: Role, content: str, local: bool = False) -> ChatMessage:
+        """Add a message and store it; memory keeps only the newest messages"""
+        message = ChatMessage(Role(role), content, local=local)
+        self.persist(message)
+        self.adopt(message)
+        return message
+
+    def persist(self, message: ChatMessage):
+        """Queue message for the store only; safe from any thread, e.g. a worker finishing a reply"""
+        self._writer.insert((self.session_id, message.id, message.role.value,
+                             message.content, message.created_at, int(message.local)))
+
+    def adopt(self, message: ChatMessage):
+        """Add a message already passed to persist() to this session's view of the conversation"""
+        expected = len(self)
+        self._writer.flush()
+        seq = self._seq_of(message.id)
+        if seq is not None and seq != expected:
+            # Someone else appended meanwhile: take their messages too, so positions match the store's
+            self._recent.clear()
+            self._offset = 0
+            self._resume(self._resume_page)
+            return
+        self._recent.append(message)
+        if len(self._recent) > self._memory_limit:
+            # Drop the oldest quarter at once; they are already in the store
+            for _ in range(max(1, self._memory_limit // 4)):
+                self._recent.popleft()
+                self._offset += 1
+
+    def slice(self, start: int, stop: int) -> List[ChatMessage]:
+        """Messages [start, stop) by position in the whole conversation"""
+        start, stop = max(0, start), min(stop, len(self))
+        if start >= stop:
+            return []
+        messages = []
+        if start < self._offset:
+            messages.extend(self._load(start, min(stop, self._offset)))
+        if stop > self._offset:
+            recent_start = max(0, start - self._offset)
+            recent_stop = stop - self._offset
+            messages.extend(islice(self._recent, recent_start, recent_stop))
+        return messages
+
+    def recent(self, count: int) -> List[ChatMessage]:
+        """The latest count messages"""
+        return self.slice(len(self) - count, len(self))
+
+    def clear(self):
+        """Forget the whole conversation, in memory and in the store"""
+        self._writer.delete(self.session_id)
+        self._recent.clear()
+        self._offset = 0
+
+    def _resume(self, page: int):
+        # A reload can arrive before the previous session's last writes are committed
+        self._writer.flush()
+        conn = _connect(self._db_path)
+        try:
+            total = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation_id = ?", (self.session_id,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        if total:
+            self._offset = max(0, total - page)
+            self._recent.extend(self._select(self._offset, total))
+
+    def _seq_of(self, message_id: str) -> Optional[int]:
+        conn = _connect(self._db_path)
+        try:
+            row = conn.execute("SELECT seq FROM messages WHERE conversation_id = ? AND id = ?",
+                               (self.session_id, message_id)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def _load(self, start: int, stop: int) -> List[ChatMessage]:
+        # Rows dropped from memory may still be queued
+        self._writer.flush()
+        return self._select(start, stop)
+
+    def _select(self, start: int, stop: int) -> List[ChatMessage]:
+        conn = _connect(self._db_path)
+        try:
+            rows = conn.execute(
+                "SELECT role, content, id, created_at, local FROM messages "
+                "WHERE conversation_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (self.session_id, start, stop)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [ChatMessage(Role(role), content, message_id, created_at, bool(local))
+                for role, content, message_id, created_at, local in rows]
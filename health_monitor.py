@@ -0,0 +1,158 @@
+import streamlit as st
+import json
+import threading
+import time
+import os
+from functools import partial
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+import requests
+
+from backend_client import BACKEND_URL, get_backend_client, health_timeout
+from load_balancer import LoadBalancer
+from metrics import MetricsCollector
+from shared_state import SharedState, get_shared_state
+
+# Seconds a health result stays fresh before a background re-probe
+HEALTH_TTL = float(os.getenv("BACKEND_HEALTH_TTL", "15"))
+# Upper bound for the retry delay while the backend keeps failing
+HEALTH_MAX_BACKOFF = float(os.getenv("BACKEND_HEALTH_MAX_BACKOFF", "300"))
+# Shared-state key where the latest probe result is published for the other workers
+HEALTH_KEY = "health:status"
+
+
+@dataclass(frozen=True)
+class HealthStatus:
+    """Last known result of a /health probe"""
+    online: Optional[bool] = None  # None until the first probe finishes
+    checked_at: Optional[datetime] = None
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["checked_at"] = self.checked_at.isoformat() if self.checked_at else None
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, value: str) -> "HealthStatus":
+        data = json.loads(value)
+        if data["checked_at"]:
+            data["checked_at"] = datetime.fromisoformat(data["checked_at"])
+        return cls(**data)
+
+
+def probe_backend(session: requests.Session, base_url: str = BACKEND_URL) -> HealthStatus:
+    """Run one synchronous GET /health against the backend"""
+    started = time.perf_counter()
+    try:
+        response = session.get(f"{base_url}/health", timeout=health_timeout())
+        latency_ms = (time.perf_counter() - started) * 1000
+        if response.status_code == 200:
+            return HealthStatus(True, datetime.now(), latency_ms)
+        return HealthStatus(False, datetime.now(), latency_ms, f"HTTP {response.status_code}")
+    except Exception as e:
+        latency_ms = (time.perf_counter() - started) * 1000
+        return HealthStatus(False, datetime.now(), latency_ms, str(e))
+
+
+def probe_replicas(session: requests.Session, balancer: LoadBalancer,
+                   metrics: MetricsCollector = None) -> HealthStatus:
+    """Probe every replica, eject the failing ones and report online if any replica is up"""
+    results = []
+    for url in balancer.urls:
+        status = probe_backend(session, url)
+        balancer.mark_health(url, bool(status.online))
+        if metrics is not None and status.latency_ms is not None:
+            metrics.observe("health_ms", status.latency_ms)
+        results.append(status)
+
+    healthy = [status for status in results if status.online]
+    if healthy:
+        best = min(healthy, key=lambda status: status.latency_ms)
+        error = None
+        if len(healthy) < len(results):
+            error = f"{len(results) - len(healthy)} of {len(results)} replicas down"
+        return HealthStatus(True, datetime.now(), best.latency_ms, error)
+    return HealthStatus(False, datetime.now(), None, "; ".join(status.error or "" for status in results))
+
+
+class HealthMonitor:
+    """Process-wide health cache refreshed in the background with exponential backoff on failure
+
+    With a cross-process shared state, a result another worker published less than ttl
+    ago is reused instead of probing again, so N workers don't mean N times the probes.
+    """
+
+    def __init__(self, probe: Callable[[], HealthStatus], ttl: float = HEALTH_TTL,
+                 max_backoff: float = HEALTH_MAX_BACKOFF, shared: SharedState = None):
+        self._probe = probe
+        self._ttl = ttl
+        self._max_backoff = max_backoff
+        self._shared = shared if shared is not None and shared.shared else None
+        self._lock = threading.Lock()
+        self._status = HealthStatus()
+        self._failures = 0
+        self._next_probe_at = 0.0
+        self._refreshing = False
+
+    def status(self) -> HealthStatus:
+        """Return the last known status at once, kicking off a refresh if it is stale"""
+        with self._lock:
+            if not self._refreshing and time.monotonic() >= self._next_probe_at:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name="health-monitor", daemon=True).start()
+            return self._status
+
+    def _refresh(self):
+        status = self._published()
+        if status is None:
+            try:
+                status = self._probe()
+            except Exception as e:
+                status = HealthStatus(False, datetime.now(), None, str(e))
+            self._publish(status)
+        with self._lock:
+            self._status = status
+            if status.online:
+                self._failures = 0
+                delay = self._ttl
+            else:
+                self._failures += 1
+                delay = min(self._ttl * 2 ** (self._failures - 1), self._max_backoff)
+            self._next_probe_at = time.monotonic() + delay
+            self._refreshing = False
+
+    def _published(self) -> Optional[HealthStatus]:
+        """A fresh result from another worker, if there is one"""
+        if self._shared is None:
+            return None
+        try:
+            value = self._shared.get(HEALTH_KEY)
+            status = HealthStatus.from_json(value) if value else None
+        except Exception:
+            return None
+        if status is None or status.checked_at is None:
+            return None
+        if (datetime.now() - status.checked_at).total_seconds() >= self._ttl:
+            return None
+        return status
+
+    def _publish(self, status: HealthStatus):
+        if self._shared is None:
+            return
+        try:
+            self._shared.set(HEALTH_KEY, status.to_json(), self._ttl)
+        except Exception:
+            pass  # the next probe publishes again
+
+
+@st.cache_resource
+def get_health_monitor() -> HealthMonitor:
+    """Health monitor shared by every session in this worker"""
+    # Bind the client here: cached resources can't be looked up from the probe thread
+    client = get_backend_client()
+    return HealthMonitor(partial(probe_replicas, client.http, client.balancer, client.metrics),
+                         shared=get_shared_state())
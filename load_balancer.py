@@ -0,0 +1,96 @@
+import threading
+import time
+import os
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+# Seconds a replica stays out of rotation after a failed request or /health probe
+EJECTION_TIME = float(os.getenv("BACKEND_EJECTION_TIME", "30"))
+# Conversations remembered for replica affinity
+AFFINITY_SIZE = int(os.getenv("BACKEND_AFFINITY_SIZE", "10000"))
+# Weight of the newest sample in the latency moving average
+LATENCY_ALPHA = 0.3
+
+
+class Replica:
+    """One backend replica with its load and health bookkeeping"""
+
+    __slots__ = ("url", "outstanding", "latency", "ejected_until")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.latency = 0.0  # EWMA seconds; 0 until the first sample
+        self.ejected_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+
+class LoadBalancer:
+    """Least-outstanding-requests balancing, latency aware, with health ejection and conversation affinity"""
+
+    def __init__(self, urls: Iterable[str], ejection_time: float = EJECTION_TIME,
+                 affinity_size: int = AFFINITY_SIZE):
+        self._replicas = [Replica(url) for url in urls]
+        if not self._replicas:
+            raise ValueError("LoadBalancer needs at least one backend URL")
+        self._ejection_time = ejection_time
+        self._affinity_size = affinity_size
+        self._affinity = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return [replica.url for replica in self._replicas]
+
+    def pick(self, affinity_key: Optional[str] = None, exclude: Optional[str] = None) -> Replica:
+        """Choose a replica, keeping a conversation on the same one while it stays healthy"""
+        with self._lock:
+            if affinity_key is not None:
+                url = self._affinity.get(affinity_key)
+                for replica in self._replicas:
+                    if replica.url == url and replica.url != exclude and replica.healthy:
+                        self._affinity.move_to_end(affinity_key)
+                        return replica
+
+            candidates = [r for r in self._replicas if r.url != exclude and r.healthy]
+            if not candidates:
+                # Everything is ejected: still try the replica that comes back soonest
+                pool = [r for r in self._replicas if r.url != exclude] or self._replicas
+                candidates = [min(pool, key=lambda r: r.ejected_until)]
+            replica = min(candidates, key=lambda r: (r.outstanding + 1) * (r.latency or 0.001))
+
+            if affinity_key is not None and exclude is None:
+                self._affinity[affinity_key] = replica.url
+                self._affinity.move_to_end(affinity_key)
+                while len(self._affinity) > self._affinity_size:
+                    self._affinity.popitem(last=False)
+            return replica
+
+    def acquire(self, replica: Replica):
+        with self._lock:
+            replica.outstanding += 1
+
+    def release(self, replica: Replica, latency: Optional[float] = None, ok: bool = True):
+        """Finish a request on replica; failures eject it for a while"""
+        with self._lock:
+            replica.outstanding = max(0, replica.outstanding - 1)
+            if latency is not None:
+                replica.latency = latency if not replica.latency else (
+                    LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * replica.latency
+                )
+            if not ok:
+                replica.ejected_until = time.monotonic() + self._ejection_time
+
+    def mark_health(self, url: str, ok: bool):
+        """Apply a /health probe result"""
+        with self._lock:
+            for replica in self._replicas:
+                if replica.url == url:
+                    replica.ejected_until = 0.0 if ok else time.monotonic() + self._ejection_time
+
+    def healthy_count(self) -> int:
+        with self._lock:
+            return sum(1 for replica in self._replicas if replica.healthy)
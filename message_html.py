@@ -0,0 +1,39 @@
+import html
+import os
+import re
+from functools import lru_cache
+
+# Rendered bubbles kept per worker (LRU)
+MESSAGE_HTML_CACHE_SIZE = int(os.getenv("MESSAGE_HTML_CACHE_SIZE", "4096"))
+
+_CODE = re.compile(r"`([^`\n]+)`")
+_BOLD = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_ITALIC = re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])|(?<![\w_])_(?!\s)(.+?)(?<!\s)_(?![\w_])")
+_LINK = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
+_BULLET = re.compile(r"^\s*[-*•]\s+")
+
+
+def markdown_to_html(text: str) -> str:
+    """Escape text and convert the small markdown subset the assistant uses to inline HTML"""
+    lines = []
+    for line in html.escape(text).split("\n"):
+        line = _BULLET.sub("• ", line)
+        line = _CODE.sub(r"<code>\1</code>", line)
+        line = _LINK.sub(r'<a href="\2" target="_blank" rel="noopener noreferrer">\1</a>', line)
+        line = _BOLD.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", line)
+        line = _ITALIC.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", line)
+        lines.append(line)
+    return "<br>".join(lines)
+
+
+def build_message_html(content: str, is_user: bool) -> str:
+    """Build the sanitized HTML bubble for a chat message"""
+    if is_user:
+        return f'<div class="user-message"><strong>You:</strong><br>{markdown_to_html(content)}</div>'
+    return f'<div class="assistant-message"><strong>🤖 CalendarAI:</strong><br>{markdown_to_html(content)}</div>'
+
+
+@lru_cache(maxsize=MESSAGE_HTML_CACHE_SIZE)
+def cached_message_html(message_id: str, content: str, is_user: bool) -> str:
+    """Sanitized HTML for a stored message, computed once per message id"""
+    return build_message_html(content, is_user)
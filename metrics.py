@@ -0,0 +1,199 @@
+import streamlit as st
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+from streamlit.logger import get_logger
+
+# Samples kept per metric for percentiles
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2000"))
+# Serve Prometheus text on this port (0 = off)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Log a one-line summary every N seconds (0 = off)
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))
+# Show the performance panel in the sidebar
+SHOW_PERF_PANEL = os.getenv("SHOW_PERF_PANEL", "0") in ("1", "true", "True")
+
+# Timings, in the order the panel and log line show them
+TIMINGS = {
+    "connect_ms": "DNS + connect (incl. TLS) on new connections",
+    "ttfb_ms": "Time to first byte of /chat",
+    "backend_ms": "Total /chat time",
+    "decode_ms": "Response decode",
+    "render_ms": "Script rerun render",
+    "health_ms": "/health probe",
+}
+
+logger = get_logger("calendarai.metrics")
+_connect = threading.local()
+
+
+def reset_connect_time():
+    _connect.ms = 0.0
+
+
+def add_connect_time(ms: float):
+    _connect.ms = getattr(_connect, "ms", 0.0) + ms
+
+
+def take_connect_time() -> float:
+    """Connect time spent on this thread since the last reset"""
+    ms = getattr(_connect, "ms", 0.0)
+    _connect.ms = 0.0
+    return ms
+
+
+class TurnTimer:
+    """Timings for one chat turn, filled in along the request path"""
+
+    __slots__ = ("connect_ms", "ttfb_ms", "backend_ms", "decode_ms")
+
+    def __init__(self):
+        self.connect_ms = 0.0
+        self.ttfb_ms = 0.0
+        self.backend_ms = 0.0
+        self.decode_ms = 0.0
+
+    def timed_decode(self, fn: Callable) -> Callable:
+        """Wrap a decode function so its run time is added to decode_ms"""
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.decode_ms += (time.perf_counter() - started) * 1000
+        return wrapper
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class MetricsCollector:
+    """Thread-safe rolling timings and counters shared by every session in the worker"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = {name: deque(maxlen=window) for name in TIMINGS}
+        self._totals = {name: [0, 0.0] for name in TIMINGS}  # count, sum
+        self._counters = {}
+
+    def observe(self, name: str, value_ms: float):
+        with self._lock:
+            self._samples[name].append(value_ms)
+            total = self._totals[name]
+            total[0] += 1
+            total[1] += value_ms
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def record_turn(self, timer: TurnTimer):
+        self.observe("connect_ms", timer.connect_ms)
+        self.observe("ttfb_ms", timer.ttfb_ms)
+        self.observe("backend_ms", timer.backend_ms)
+        self.observe("decode_ms", timer.decode_ms)
+        self.incr("turns")
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """count / p50 / p95 / p99 per timing over the rolling window"""
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+        return {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+            }
+            for name, values in snapshot.items()
+        }
+
+    def prometheus_text(self) -> str:
+        """Prometheus exposition format (summaries + counters)"""
+        lines = []
+        summary = self.summary()
+        with self._lock:
+            totals = {name: list(total) for name, total in self._totals.items()}
+            counters = dict(self._counters)
+        for name, help_text in TIMINGS.items():
+            metric = f"calendarai_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} summary")
+            for q in ("p50", "p95", "p99"):
+                lines.append(f'{metric}{{quantile="0.{q[1:]}"}} {summary[name][q]:.3f}')
+            lines.append(f"{metric}_count {totals[name][0]}")
+            lines.append(f"{metric}_sum {totals[name][1]:.3f}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE calendarai_{name}_total counter")
+            lines.append(f"calendarai_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def log_line(self) -> str:
+        summary = self.summary()
+        parts = [f"{name}=p50:{s['p50']:.0f}/p95:{s['p95']:.0f}/p99:{s['p99']:.0f}"
+                 for name, s in summary.items() if s["count"]]
+        parts.extend(f"{name}={value}" for name, value in sorted(self.counters().items()))
+        return " ".join(parts)
+
+
+def start_exporter(collector: MetricsCollector, port: int) -> ThreadingHTTPServer:
+    """Serve GET /metrics in Prometheus text format on a daemon thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = collector.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    return server
+
+
+def start_logger(collector: MetricsCollector, interval: float):
+    """Log a summary line every interval seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            line = collector.log_line()
+            if line:
+                logger.info("perf %s", line)
+
+    threading.Thread(target=run, name="metrics-logger", daemon=True).start()
+
+
+@st.cache_resource
+def get_metrics() -> MetricsCollector:
+    """Metrics collector shared by every session in this worker (starts the exporters once)"""
+    collector = MetricsCollector()
+    if METRICS_PORT:
+        try:
+            start_exporter(collector, METRICS_PORT)
+        except OSError as e:
+            # Another worker on this host already owns the port
+            logger.warning("metrics exporter not started on port %s: %s", METRICS_PORT, e)
+    if METRICS_LOG_INTERVAL > 0:
+        start_logger(collector, METRICS_LOG_INTERVAL)
+    return collector
@@ -0,0 +1,192 @@
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from backend_client import ReplyFailed
+from chat_executor import ChatExecutor, ChatJob
+from metrics import MetricsCollector
+from response_cache import is_read_only, normalize_prompt
+
+# Opt-in: after each reply, quietly fetch the likeliest read-only follow-up questions
+PREFETCH_ENABLED = os.getenv("CHAT_PREFETCH", "0") in ("1", "true", "True")
+# Follow-ups fetched after one reply at most
+PREFETCH_TOP = int(os.getenv("CHAT_PREFETCH_TOP", "2"))
+# Prefetches a session earns per real turn; below 1 keeps speculative load under the session's own
+PREFETCH_RATIO = float(os.getenv("CHAT_PREFETCH_RATIO", "0.5"))
+# Unused prefetches a session may bank (it starts with one)
+PREFETCH_MAX_CREDIT = 2.0
+# Seconds a prefetched reply stays usable
+PREFETCH_TTL = float(os.getenv("CHAT_PREFETCH_TTL", "30"))
+# Seconds between looks at a prefetch that is still streaming when the user asks for it
+FOLLOW_INTERVAL = 0.05
+# A prefetch still waiting for an executor slot after this long is dropped for a real call
+FOLLOW_START_TIMEOUT = float(os.getenv("CHAT_PREFETCH_START_TIMEOUT", "0.5"))
+
+_DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_DAY = re.compile(r"\b(" + "|".join(_DAYS) + r")\b", re.IGNORECASE)
+_PART = re.compile(r"\b(morning|afternoon)\b", re.IGNORECASE)
+_OTHER_PART = {"morning": "afternoon", "afternoon": "morning"}
+# "Would you like me to check Tuesday afternoon?" and similar offers in a reply
+_OFFER = re.compile(
+    r"\b(?:would you like me to|shall i|should i|do you want me to|want me to)\s+"
+    r"(check|show|find|suggest|list)\b([^?.!\n]{0,80})\?",
+    re.IGNORECASE
+)
+_AVAILABILITY = re.compile(r"\b(availab\w*|free|open)\b", re.IGNORECASE)
+WEEK_FOLLOWUP = "Suggest available times for this week"
+
+
+def _same_case(word: str, like: str) -> str:
+    return word.capitalize() if like[:1].isupper() else word
+
+
+def predict_followups(prompt: str, reply: str) -> List[str]:
+    """Likely next read-only questions, best first: the assistant's own offers, then rules of thumb"""
+    candidates = [f"{verb.capitalize()}{rest.rstrip()}" for verb, rest in _OFFER.findall(reply)]
+
+    part = _PART.search(prompt)
+    if part:
+        # Morning availability is usually followed by the afternoon, and vice versa
+        other = _OTHER_PART[part.group(1).lower()]
+        candidates.append(prompt[:part.start()] + _same_case(other, part.group(1)) + prompt[part.end():])
+    day = _DAY.search(prompt)
+    if day and _AVAILABILITY.search(prompt):
+        # ...or by the same question about the next day
+        following = _DAYS[(_DAYS.index(day.group(1).lower()) + 1) % 7]
+        candidates.append(prompt[:day.start()] + _same_case(following, day.group(1)) + prompt[day.end():])
+    if _AVAILABILITY.search(prompt):
+        candidates.append(WEEK_FOLLOWUP)
+
+    asked = normalize_prompt(prompt)
+    seen = set()
+    followups = []
+    for candidate in candidates:
+        key = normalize_prompt(candidate)
+        if key and key != asked and key not in seen and is_read_only(candidate):
+            seen.add(key)
+            followups.append(candidate)
+    return followups
+
+
+class Prefetcher:
+    """Speculative, cancellable fetches of one session's likely next questions
+
+    Every real turn earns ratio prefetches, so speculative traffic stays a bounded
+    fraction of the session's own. A prefetch only starts when the shared executor
+    has a free slot, so it never queues ahead of a real chat, and the ones still
+    running are cancelled as soon as the user asks something else.
+    """
+
+    def __init__(self, executor: ChatExecutor, metrics: MetricsCollector = None, top: int = PREFETCH_TOP,
+                 ratio: float = PREFETCH_RATIO, ttl: float = PREFETCH_TTL,
+                 max_credit: float = PREFETCH_MAX_CREDIT):
+        self.metrics = metrics or MetricsCollector()
+        self._executor = executor
+        self._top = top
+        self._ratio = ratio
+        self._ttl = ttl
+        self._max_credit = max_credit
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, tuple] = {}  # normalized prompt -> (started_at, ChatJob)
+        self._credit = min(1.0, max_credit)
+
+    def schedule(self, prompt: str, reply: str, stream_fn: Callable[..., Iterator[str]]) -> int:
+        """After a real (successful) reply: earn credit and start fetching the predicted follow-ups
+
+        Returns how many started.
+        """
+        started = 0
+        with self._lock:
+            self._credit = min(self._max_credit, self._credit + self._ratio)
+            for followup in predict_followups(prompt, reply)[:self._top]:
+                key = normalize_prompt(followup)
+                if key in self._jobs:
+                    continue
+                load = self._executor.load()
+                if self._credit < 1 or load["waiting"] or load["active"] >= load["limit"]:
+                    break
+                self._credit -= 1
+                self._jobs[key] = (time.monotonic(), self._executor.submit_background(followup, stream_fn))
+                started += 1
+        if started:
+            self.metrics.incr("prefetches", started)
+        return started
+
+    def claim(self, prompt: str) -> Optional[ChatJob]:
+        """Take the prefetch for prompt, if any, and cancel the in-flight ones the user didn't ask for"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._jobs.pop(normalize_prompt(prompt), None)
+            for key, (started_at, job) in list(self._jobs.items()):
+                if not job.done or now - started_at > self._ttl:
+                    job.cancel()
+                    del self._jobs[key]
+        if entry is None or now - entry[0] > self._ttl or entry[1].cancelled:
+            return None
+        return entry[1]
+
+    def cancel(self):
+        """Drop every prefetch, e.g. after the calendar changed or the chat was cleared"""
+        with self._lock:
+            jobs = [job for _, job in self._jobs.values()]
+            self._jobs.clear()
+        for job in jobs:
+            job.cancel()
+
+
+class _PrefetchHandle:
+    """Stands in for the HTTP response of a turn served from a prefetch: closing it cancels the prefetch"""
+
+    def __init__(self, job: ChatJob):
+        self._job = job
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        self._job.cancel()
+
+
+def prefetched_stream(prefetcher: Prefetcher,
+                      stream_fn: Callable[..., Iterator[str]]) -> Callable[..., Iterator[str]]:
+    """Wrap a reply stream so a prompt that was prefetched is served from it, live if still streaming"""
+    def stream(prompt: str, on_response=None):
+        job = prefetcher.claim(prompt)
+        if job is not None and not job.wait_started(FOLLOW_START_TIMEOUT):
+            # Still queued behind real chats: asking for real is faster than waiting for a slot
+            job.cancel()
+            job = None
+        if job is None:
+            yield from stream_fn(prompt, on_response=on_response)
+            return
+        handle = _PrefetchHandle(job)
+        if on_response is not None:
+            on_response(handle)  # so cancelling this turn cancels the prefetch it is following
+        sent = 0
+        try:
+            while not handle.closed:
+                done = job.wait(FOLLOW_INTERVAL)
+                text = job.text
+                # Failed, or cancelled under us (e.g. the calendar changed): never pass it off as a reply
+                broken = job.failed or (done and job.cancelled)
+                if broken and sent:
+                    raise ReplyFailed("⚠️ The reply was interrupted, please ask again.")
+                if not sent and (not text or broken):
+                    if done:
+                        break  # ask for real
+                    continue
+                if len(text) > sent:
+                    if not sent:
+                        prefetcher.metrics.incr("prefetch_hits")
+                    yield text[sent:]
+                    sent = len(text)
+                if done:
+                    return
+        finally:
+            if not job.done:
+                job.cancel()
+        if handle.closed:
+            return
+        yield from stream_fn(prompt, on_response=on_response)
+    return stream
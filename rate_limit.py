@@ -0,0 +1,41 @@
+import os
+import threading
+import time
+
+# Per-session message budget: sustained messages per minute (0 = unlimited) and the burst allowed
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "20"))
+CHAT_RATE_BURST = int(os.getenv("CHAT_RATE_BURST", "5"))
+
+
+class TokenBucket:
+    """Classic token bucket: refills at rate tokens per second up to capacity"""
+
+    def __init__(self, rate: float = CHAT_RATE_PER_MINUTE / 60, capacity: int = CHAT_RATE_BURST):
+        self._rate = rate
+        self._capacity = max(1, capacity)
+        self._tokens = float(self._capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def allow(self, cost: float = 1.0) -> bool:
+        """Take cost tokens if there are enough"""
+        if self._rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < cost:
+                return False
+            self._tokens -= cost
+            return True
+
+    def retry_in(self, cost: float = 1.0) -> float:
+        """Seconds until cost tokens are available"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._rate <= 0 or self._tokens >= cost:
+                return 0.0
+            return (cost - self._tokens) / self._rate
@@ -0,0 +1,160 @@
+import threading
+import time
+import random
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# Retries for transient failures (attempts after the first)
+MAX_RETRIES = int(os.getenv("BACKEND_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("BACKEND_RETRY_BACKOFF", "0.25"))
+RETRY_BACKOFF_MAX = float(os.getenv("BACKEND_RETRY_BACKOFF_MAX", "2"))
+# Circuit breaker: consecutive failures before opening, seconds before a trial request
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BACKEND_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BACKEND_BREAKER_RESET", "30"))
+# Hedged requests: second replica and how long to wait for the first before trying it
+HEDGE_URL = os.getenv("BACKEND_HEDGE_URL", "")
+HEDGE_DELAY = float(os.getenv("BACKEND_HEDGE_DELAY", "1.5"))
+
+# Statuses that mean "try again"; 503 is an explicit refusal, so it is safe for every request
+TRANSIENT_STATUSES = {502, 503, 504}
+ALWAYS_SAFE_STATUSES = {503}
+
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a backend the breaker considers down"""
+
+
+class ConnectFailed(requests.ConnectionError):
+    """The connection could not be opened, so no part of the request was sent"""
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker shared by every session in the worker"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self._reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial request through"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self._reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Whether a request may go out now (only one trial while half-open)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self._reset_timeout or self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self._failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry number (0-based)"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt))
+
+
+def is_connect_failure(error: Exception) -> bool:
+    """True when the call failed while connecting, before any of the request went out"""
+    if isinstance(error, (requests.ConnectTimeout, ConnectFailed)):
+        return True
+    # requests wraps urllib3's MaxRetryError, whose reason tells the connect phase apart
+    cause = error.args[0] if isinstance(error, requests.ConnectionError) and error.args else None
+    return isinstance(getattr(cause, "reason", cause), NewConnectionError)
+
+
+def is_retryable_error(error: Exception, idempotent: bool) -> bool:
+    """A failed connect never reached the agent; anything later only retries idempotent calls
+
+    A reset, a disconnect or a read timeout can come after the body was sent and
+    acted on, so retrying a booking then could book it twice.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if is_connect_failure(error):
+        return True
+    return idempotent and isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def is_retryable_status(status_code: int, idempotent: bool) -> bool:
+    if status_code in ALWAYS_SAFE_STATUSES:
+        return True
+    return idempotent and status_code in TRANSIENT_STATUSES
+
+
+def hedged_call(primary: Callable[[], requests.Response], hedge: Callable[[], requests.Response],
+                delay: float = HEDGE_DELAY) -> requests.Response:
+    """Run primary; if it hasn't answered within delay, race hedge against it and keep the first reply"""
+    first = _hedge_pool.submit(primary)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        if first.exception() is None:
+            return first.result()
+        # Primary failed fast: fail over to the replica straight away
+        return hedge()
+
+    second = _hedge_pool.submit(hedge)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                winner = future.result()
+            except Exception as e:
+                error = e
+                continue
+            # Close whichever request loses the race once it finishes
+            for loser in (done | pending) - {future}:
+                loser.add_done_callback(_close_response)
+            return winner
+    raise error
+
+
+def _close_response(future):
+    try:
+        future.result().close()
+    except Exception:
+        pass
@@ -0,0 +1,175 @@
+import streamlit as st
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, Optional
+
+from streamlit.logger import get_logger
+
+from shared_state import SharedState, get_shared_state
+
+# Opt-in: cache replies to read-only prompts (availability checks, suggestions)
+RESPONSE_CACHE_ENABLED = os.getenv("CHAT_RESPONSE_CACHE", "0") in ("1", "true", "True")
+RESPONSE_CACHE_TTL = float(os.getenv("CHAT_RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_SIZE = int(os.getenv("CHAT_RESPONSE_CACHE_SIZE", "512"))
+# Calendar the replies belong to; cache entries never cross scopes
+DEFAULT_SCOPE = os.getenv("CALENDAR_SCOPE", "default")
+
+_READ_ONLY = re.compile(r"\b(check|availab\w*|free|suggest|show|list|find|what|when|which|any|open)\b")
+_MUTATING = re.compile(r"\b(book|schedule|reschedule|cancel|move|block|delete|remove|confirm|reserve|add|create|update|yes)\b")
+logger = get_logger("calendarai.cache")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-fold and collapse whitespace/punctuation so trivially different prompts share a key"""
+    return " ".join(re.sub(r"[^\w:]+", " ", prompt.casefold()).split())
+
+
+def is_read_only(prompt: str) -> bool:
+    """True for prompts that only ask about the calendar and never change it"""
+    normalized = normalize_prompt(prompt)
+    return bool(_READ_ONLY.search(normalized)) and not _MUTATING.search(normalized)
+
+
+def is_mutating(prompt: str) -> bool:
+    """True for prompts that may book, move or cancel something"""
+    return bool(_MUTATING.search(normalize_prompt(prompt)))
+
+
+class ResponseCache:
+    """TTL + LRU cache of replies keyed by (scope, normalized prompt), with hit/miss counters
+
+    With a cross-process shared state the local LRU sits in front of it: replies cached by
+    any worker are served by all of them, and invalidating a scope bumps a shared generation
+    number that every worker folds into its keys, so stale local copies are never read.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_SIZE,
+                 shared: SharedState = None):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._shared = shared if shared is not None and shared.shared else None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prompt: str, scope: str = DEFAULT_SCOPE) -> Optional[str]:
+        normalized = normalize_prompt(prompt)
+        generation = self._generation(scope)
+        key = (scope, generation, normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        reply = self._shared_get(scope, generation, normalized)
+        with self._lock:
+            if reply is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, reply[0], reply[1])
+            return reply[1]
+
+    def put(self, prompt: str, reply: str, scope: str = DEFAULT_SCOPE):
+        normalized = normalize_prompt(prompt)
+        generation = self._generation(scope)
+        with self._lock:
+            self._store((scope, generation, normalized), self._ttl, reply)
+        if self._shared is not None and generation >= 0:
+            value = json.dumps({"expires_at": time.time() + self._ttl, "reply": reply})
+            try:
+                self._shared.set(self._shared_key(scope, generation, normalized), value, self._ttl)
+            except Exception as e:
+                logger.warning("shared cache write failed: %s", e)
+
+    def invalidate(self, scope: Optional[str] = None):
+        """Drop every entry for scope (or everything cached here), e.g. after a booking went through"""
+        with self._lock:
+            if scope is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == scope]:
+                    del self._entries[key]
+        if self._shared is not None and scope is not None:
+            try:
+                self._shared.incr(f"resp-gen:{scope}")
+            except Exception as e:
+                logger.warning("shared cache invalidation failed: %s", e)
+
+    def _store(self, key: tuple, ttl: float, reply: str):
+        self._entries[key] = (time.monotonic() + ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _generation(self, scope: str) -> int:
+        if self._shared is None:
+            return 0
+        try:
+            return int(self._shared.get(f"resp-gen:{scope}") or 0)
+        except Exception as e:
+            logger.warning("shared cache unavailable: %s", e)
+            return -1  # local-only until the shared tier is back
+
+    @staticmethod
+    def _shared_key(scope: str, generation: int, normalized: str) -> str:
+        return f"resp:{scope}:{generation}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+    def _shared_get(self, scope: str, generation: int, normalized: str) -> Optional[tuple]:
+        """(seconds left, reply) from the shared tier, or None"""
+        if self._shared is None or generation < 0:
+            return None
+        try:
+            value = self._shared.get(self._shared_key(scope, generation, normalized))
+        except Exception as e:
+            logger.warning("shared cache read failed: %s", e)
+            return None
+        if value is None:
+            return None
+        entry = json.loads(value)
+        remaining = entry["expires_at"] - time.time()
+        return (remaining, entry["reply"]) if remaining > 0 else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def cached_stream(cache: ResponseCache, scope: str,
+                  stream_fn: Callable[..., Iterator[str]]) -> Callable[..., Iterator[str]]:
+    """Wrap a reply stream so read-only prompts are served from, and written back to, the cache"""
+    def stream(prompt: str, on_response=None):
+        if not is_read_only(prompt):
+            yield from stream_fn(prompt, on_response=on_response)
+            return
+
+        cached = cache.get(prompt, scope)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        for token in stream_fn(prompt, on_response=on_response):
+            chunks.append(token)
+            yield token
+        # Only reached when the stream ran to completion: not cancelled, and no ReplyFailed
+        reply = "".join(chunks)
+        if reply:
+            cache.put(prompt, reply, scope)
+    return stream
+
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Response cache shared by every session in this worker (and across workers with a shared state)"""
+    return ResponseCache(shared=get_shared_state())
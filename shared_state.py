@@ -0,0 +1,187 @@
+import streamlit as st
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+from urllib.parse import urlsplit
+
+# Where state shared between Streamlit workers lives:
+#   memory://                         this process only (default)
+#   sqlite:////mnt/shared/state.db    a file every worker opens (same host, or a shared volume)
+#   redis://host:6379/0               any Redis-compatible server (needs the redis package)
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+# SQLite WAL journaling is faster but needs shared memory, so only turn it on when every
+# process opening the file runs on one host; never for a file on a network volume
+SQLITE_WAL = os.getenv("SQLITE_WAL", "0") in ("1", "true", "True")
+
+
+def sqlite_journal_pragma() -> str:
+    return "PRAGMA journal_mode=WAL" if SQLITE_WAL else "PRAGMA journal_mode=DELETE"
+
+
+class SharedState(ABC):
+    """Small string key-value store with per-key expiry"""
+
+    shared = False  # True when other processes see the same data
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Atomically add one to an integer value (missing counts as 0) and return it"""
+
+
+class InProcessState(SharedState):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # key -> (expires_at or None, value)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.time():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.time() + ttl if ttl else None, value)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._data.get(key)
+            value = int(entry[1]) + 1 if entry is not None else 1
+            self._data[key] = (entry[0] if entry is not None else None, str(value))
+            return value
+
+
+class SQLiteState(SharedState):
+    """Key-value table in a SQLite file that several processes open
+
+    Rollback-journal mode by default, which relies only on file locks and so also works
+    for pods sharing a volume (if its filesystem honours them); SQLITE_WAL=1 for one host.
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shared_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            )
+        """)
+        conn.execute("DELETE FROM shared_state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute(sqlite_journal_pragma())
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+                         (key, value, time.time() + ttl if ttl else None))
+
+    def delete(self, key: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def incr(self, key: str) -> int:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO shared_state VALUES (?, '1', NULL) "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (key,)
+            )
+            return int(conn.execute("SELECT value FROM shared_state WHERE key = ?", (key,)).fetchone()[0])
+
+
+class RedisState(SharedState):
+    shared = True
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_STATE_URL is a redis:// URL but the redis package is not installed")
+        self._client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self._client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+def open_shared_state(url: str = SHARED_STATE_URL) -> SharedState:
+    scheme = urlsplit(url).scheme
+    if scheme in ("", "memory"):
+        return InProcessState()
+    if scheme == "sqlite":
+        # sqlite:////abs/path.db or sqlite:///relative.db, as in SQLAlchemy URLs
+        return SQLiteState(url[len("sqlite:///"):])
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL scheme: {scheme}")
+
+
+def is_cross_process(url: str = SHARED_STATE_URL) -> bool:
+    """True when the configured state is seen by other workers"""
+    return urlsplit(url).scheme not in ("", "memory")
+
+
+def shared_sqlite_path(url: str = SHARED_STATE_URL) -> Optional[str]:
+    """The database file when shared state lives in SQLite, so other stores can sit next to it"""
+    return url[len("sqlite:///"):] if urlsplit(url).scheme == "sqlite" else None
+
+
+@st.cache_resource
+def get_shared_state() -> SharedState:
+    """Shared-state client for this worker"""
+    return open_shared_state()
@@ -0,0 +1,201 @@
+import streamlit as st
+import os
+import threading
+from typing import Callable, Dict, Hashable, Iterator, List
+
+from metrics import MetricsCollector, get_metrics
+from response_cache import is_read_only, normalize_prompt
+
+# Collapse identical concurrent read-only prompts into one backend call
+COALESCE_ENABLED = os.getenv("CHAT_COALESCE", "1") not in ("0", "false", "False")
+
+
+class _Flight:
+    """One backend call in progress and the tokens it has produced so far"""
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.response = None
+        self.cond = threading.Condition()
+
+    def attach(self, response):
+        with self.cond:
+            self.response = response
+            abandoned = self.subscribers == 0
+        if abandoned:
+            response.close()
+
+    def append(self, token: str):
+        with self.cond:
+            self.tokens.append(token)
+            self.cond.notify_all()
+
+    def finish(self, error: Exception = None):
+        with self.cond:
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+
+class _Subscription:
+    """What a caller's on_response sees: close() stops its copy of the reply, not the shared call"""
+
+    def __init__(self, flights: "SingleFlight", key: Hashable, flight: _Flight):
+        self._flights = flights
+        self._key = key
+        self._flight = flight
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._flights._leave(self._key, self._flight)
+
+
+class SingleFlight:
+    """Shares one in-flight reply stream between every caller asking the same thing at the same time
+
+    The first caller drives the backend call on its own thread; later callers replay
+    the tokens so far and then follow along; if the call fails, every caller gets the
+    error rather than a short reply. If the driving caller goes away while
+    others still wait, the rest of the stream is drained on a helper thread; when the
+    last caller goes away the backend call is aborted.
+    """
+
+    def __init__(self, metrics: MetricsCollector = None):
+        self._metrics = metrics or MetricsCollector()
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stream(self, key: Hashable, produce: Callable[..., Iterator[str]], on_response=None) -> Iterator[str]:
+        """Reply tokens for key, from a new produce(on_response=...) call or one already running
+
+        Joins (or starts) the flight on the first next(), so a generator that is never
+        iterated never holds a flight open.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            with flight.cond:
+                flight.subscribers += 1
+        subscription = _Subscription(self, key, flight)
+        if on_response is not None:
+            on_response(subscription)
+        if leader:
+            yield from self._lead(key, flight, produce, subscription)
+        else:
+            self._metrics.incr("coalesced_calls")
+            yield from self._follow(flight, subscription)
+
+    def _lead(self, key: Hashable, flight: _Flight, produce: Callable[..., Iterator[str]],
+              subscription: _Subscription) -> Iterator[str]:
+        tokens = produce(on_response=flight.attach)
+        finished = False
+        error = None
+        try:
+            for token in tokens:
+                flight.append(token)
+                if subscription.closed:
+                    break
+                yield token
+            else:
+                finished = True
+        except Exception as e:
+            finished = True
+            error = e
+            raise
+        finally:
+            if finished:
+                self._finish(key, flight, error)
+                subscription.close()
+            else:
+                subscription.close()
+                if flight.subscribers:
+                    # Others are still reading this reply; finish the call for them off this thread
+                    threading.Thread(target=self._drain, args=(key, flight, tokens),
+                                     name="single-flight-drain", daemon=True).start()
+                else:
+                    tokens.close()
+                    self._finish(key, flight)
+
+    def _follow(self, flight: _Flight, subscription: _Subscription) -> Iterator[str]:
+        position = 0
+        try:
+            while True:
+                with flight.cond:
+                    while position == len(flight.tokens) and not flight.done and not subscription.closed:
+                        flight.cond.wait()
+                    if subscription.closed:
+                        return
+                    pending = flight.tokens[position:]
+                    done = flight.done
+                position += len(pending)
+                yield from pending
+                if done and position == len(flight.tokens):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            subscription.close()
+
+    def _drain(self, key: Hashable, flight: _Flight, tokens: Iterator[str]):
+        error = None
+        try:
+            for token in tokens:
+                flight.append(token)
+        except Exception as e:
+            error = e
+        finally:
+            self._finish(key, flight, error)
+
+    def _finish(self, key: Hashable, flight: _Flight, error: Exception = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(error)
+
+    def _leave(self, key: Hashable, flight: _Flight):
+        with flight.cond:
+            flight.subscribers -= 1
+            abandoned = flight.subscribers == 0 and not flight.done
+            response = flight.response
+            flight.cond.notify_all()
+        if abandoned:
+            # Nobody is waiting any more: new callers start fresh, and the backend call is aborted
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            if response is not None:
+                response.close()
+
+
+def coalesced_stream(flights: SingleFlight, scope: str, stream_fn: Callable[..., Iterator[str]],
+                     context_key: str = "") -> Callable[..., Iterator[str]]:
+    """Wrap a reply stream so identical concurrent read-only prompts in a scope share one backend call
+
+    context_key fingerprints the history sent along with the prompt; only calls with
+    the same history are merged.
+    """
+    def stream(prompt: str, on_response=None):
+        # Anything that might book must reach the backend once per user, however it is worded
+        if not is_read_only(prompt):
+            return stream_fn(prompt, on_response=on_response)
+        return flights.stream((scope, normalize_prompt(prompt), context_key),
+                              lambda on_response: stream_fn(prompt, on_response=on_response),
+                              on_response)
+    return stream
+
+
+@st.cache_resource
+def get_single_flight() -> SingleFlight:
+    """In-flight reply registry shared by every session in this worker"""
+    return SingleFlight(get_metrics())
@@ -1,8 +1,10 @@
 import streamlit as st
-import requests
 import json
 from datetime import datetime
 
+from backend_client import get_backend_client
+from wire_format import STRUCTURED_ACCEPT, decode_body
+
 # Page config
 st.set_page_config(
     page_title="Calendar Booking Agent",
@@ -10,19 +12,15 @@ st.set_page_config(
     layout="wide"
 )
 
-# Backend URL
-BACKEND_URL = "http://localhost:8000"  # Change for production
-
 def send_message(message: str):
-    """Send message to backend"""
+    """Send message to backend through the worker's shared (async, HTTP/2 when available) client"""
     try:
-        response = requests.post(
-            f"{BACKEND_URL}/chat",
-            json={"content": message},
-            headers={"Content-Type": "application/json"}
+        response = get_backend_client().open_chat(
+            {"content": message},
+            headers={"Accept": STRUCTURED_ACCEPT}
         )
         response.raise_for_status()
-        return response.json()["response"]
+        return decode_body(response)["response"]
     except Exception as e:
         return f"Error: {str(e)}"
 
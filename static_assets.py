@@ -0,0 +1,28 @@
+import streamlit as st
+import hashlib
+import os
+
+# Files under ./static, served by Streamlit at app/static/ when static serving is on
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+
+
+@st.cache_resource
+def stylesheet_tag(name: str) -> str:
+    """Markup that loads static/<name>, built once per worker
+
+    With server.enableStaticServing the browser fetches the file once and caches it;
+    the content hash in the query string busts that cache when the file changes.
+    Without it the CSS is inlined as a <style> block.
+    """
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        content = f.read()
+    if st.get_option("server.enableStaticServing"):
+        version = hashlib.sha256(content).hexdigest()[:12]
+        return f'<link rel="stylesheet" href="{STATIC_URL}/{name}?v={version}">'
+    return f"<style>\n{content.decode('utf-8')}</style>"
+
+
+def load_stylesheet(name: str):
+    """Attach static/<name> to the page"""
+    st.markdown(stylesheet_tag(name), unsafe_allow_html=True)
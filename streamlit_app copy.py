@@ -3,10 +3,13 @@ import requests
 import json
 from datetime import datetime, timedelta
 import time
-import plotly.express as px
-import plotly.graph_objects as go
 from typing import Dict, List
 
+from static_assets import load_stylesheet
+from usage_stats import GRAIN_HOUR, get_usage_stats
+
+# plotly is heavy (~0.3 s to import with pandas); import it inside chart helpers only when a chart is shown
+
 # Page config
 st.set_page_config(
     page_title="CalendarAI Pro - Smart Booking Assistant",
@@ -18,285 +21,14 @@ st.set_page_config(
 # Backend URL
 BACKEND_URL = "http://localhost:8000"  # Change for production
 
-# Custom CSS for enterprise styling
+# Custom CSS for enterprise styling (static/theme-pro.css; Inter if installed locally, else system fonts)
 def load_custom_css():
-    st.markdown("""
-    <style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Root variables for consistent theming */
-    :root {
-        --primary-color: #6366f1;
-        --secondary-color: #8b5cf6;
-        --accent-color: #06b6d4;
-        --success-color: #10b981;
-        --warning-color: #f59e0b;
-        --error-color: #ef4444;
-        --neutral-50: #f8fafc;
-        --neutral-100: #f1f5f9;
-        --neutral-200: #e2e8f0;
-        --neutral-300: #cbd5e1;
-        --neutral-400: #94a3b8;
-        --neutral-500: #64748b;
-        --neutral-600: #475569;
-        --neutral-700: #334155;
-        --neutral-800: #1e293b;
-        --neutral-900: #0f172a;
-    }
-    
-    /* Global styles */
-    .stApp {
-        background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%);
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Header styling */
-    .main-header {
-        background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
-        padding: 2rem;
-        border-radius: 16px;
-        margin-bottom: 2rem;
-        box-shadow: 0 10px 25px rgba(99, 102, 241, 0.1);
-        color: white;
-        text-align: center;
-    }
-    
-    .main-header h1 {
-        font-size: 2.5rem;
-        font-weight: 700;
-        margin-bottom: 0.5rem;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    
-    .main-header p {
-        font-size: 1.1rem;
-        opacity: 0.9;
-        margin-bottom: 0;
-    }
-    
-    /* Chat container */
-    .chat-container {
-        background: white;
-        border-radius: 16px;
-        padding: 1.5rem;
-        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-        margin-bottom: 2rem;
-        min-height: 500px;
-        max-height: 600px;
-        overflow-y: auto;
-    }
-    
-    /* Message styling */
-    .user-message {
-        background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
-        color: white;
-        padding: 1rem 1.5rem;
-        border-radius: 18px 18px 4px 18px;
-        margin: 0.5rem 0;
-        margin-left: 3rem;
-        box-shadow: 0 2px 8px rgba(99, 102, 241, 0.2);
-        animation: slideInRight 0.3s ease-out;
-    }
-    
-    .assistant-message {
-        background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%);
-        color: var(--neutral-800);
-        padding: 1rem 1.5rem;
-        border-radius: 18px 18px 18px 4px;
-        margin: 0.5rem 0;
-        margin-right: 3rem;
-        border-left: 4px solid var(--accent-color);
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.05);
-        animation: slideInLeft 0.3s ease-out;
-    }
-    
-    /* Animations */
-    @keyframes slideInRight {
-        from { transform: translateX(100px); opacity: 0; }
-        to { transform: translateX(0); opacity: 1; }
-    }
-    
-    @keyframes slideInLeft {
-        from { transform: translateX(-100px); opacity: 0; }
-        to { transform: translateX(0); opacity: 1; }
-    }
-    
-    @keyframes pulse {
-        0%, 100% { transform: scale(1); }
-        50% { transform: scale(1.05); }
-    }
-    
-    /* Sidebar styling */
-    .sidebar-content {
-        background: white;
-        border-radius: 12px;
-        padding: 1.5rem;
-        margin-bottom: 1rem;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-    }
-    
-    .sidebar-header {
-        color: var(--neutral-800);
-        font-weight: 600;
-        font-size: 1.1rem;
-        margin-bottom: 1rem;
-        padding-bottom: 0.5rem;
-        border-bottom: 2px solid var(--neutral-100);
-    }
-    
-    /* Button styling */
-    .stButton > button {
-        background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
-        color: white;
-        border: none;
-        padding: 0.75rem 1.5rem;
-        border-radius: 12px;
-        font-weight: 500;
-        font-size: 0.9rem;
-        transition: all 0.3s ease;
-        width: 100%;
-        margin-bottom: 0.5rem;
-        box-shadow: 0 2px 4px rgba(99, 102, 241, 0.2);
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(99, 102, 241, 0.3);
-        background: linear-gradient(135deg, #5855eb 0%, #7c3aed 100%);
-    }
-    
-    .secondary-button {
-        background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%) !important;
-        color: var(--neutral-700) !important;
-        border: 1px solid var(--neutral-200) !important;
-    }
-    
-    .secondary-button:hover {
-        background: linear-gradient(135deg, #e2e8f0 0%, #cbd5e1 100%) !important;
-    }
-    
-    /* Input styling */
-    .stTextInput > div > div > input {
-        border-radius: 12px;
-        border: 2px solid var(--neutral-200);
-        padding: 0.75rem 1rem;
-        font-size: 1rem;
-        transition: all 0.3s ease;
-    }
-    
-    .stTextInput > div > div > input:focus {
-        border-color: var(--primary-color);
-        box-shadow: 0 0 0 3px rgba(99, 102, 241, 0.1);
-    }
-    
-    /* Metric cards */
-    .metric-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 12px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-        margin-bottom: 1rem;
-        border-left: 4px solid var(--accent-color);
-    }
-    
-    .metric-value {
-        font-size: 2rem;
-        font-weight: 700;
-        color: var(--primary-color);
-        margin-bottom: 0.25rem;
-    }
-    
-    .metric-label {
-        color: var(--neutral-600);
-        font-size: 0.9rem;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
-    
-    /* Status indicators */
-    .status-online {
-        display: inline-block;
-        width: 10px;
-        height: 10px;
-        background: var(--success-color);
-        border-radius: 50%;
-        margin-right: 0.5rem;
-        animation: pulse 2s infinite;
-    }
-    
-    .status-text {
-        color: var(--success-color);
-        font-weight: 500;
-        font-size: 0.9rem;
-    }
-    
-    /* Loading spinner */
-    .loading-spinner {
-        border: 3px solid var(--neutral-200);
-        border-top: 3px solid var(--primary-color);
-        border-radius: 50%;
-        width: 30px;
-        height: 30px;
-        animation: spin 1s linear infinite;
-        margin: 0 auto;
-    }
-    
-    @keyframes spin {
-        0% { transform: rotate(0deg); }
-        100% { transform: rotate(360deg); }
-    }
-    
-    /* Quick actions */
-    .quick-action {
-        background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%);
-        padding: 1rem;
-        border-radius: 12px;
-        margin-bottom: 0.5rem;
-        border: 1px solid var(--neutral-200);
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-    
-    .quick-action:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-        border-color: var(--primary-color);
-    }
-    
-    .quick-action-icon {
-        font-size: 1.2rem;
-        margin-right: 0.5rem;
-    }
-    
-    .quick-action-text {
-        font-weight: 500;
-        color: var(--neutral-700);
-    }
-    
-    /* Responsive design */
-    @media (max-width: 768px) {
-        .main-header h1 {
-            font-size: 2rem;
-        }
-        
-        .user-message,
-        .assistant-message {
-            margin-left: 1rem;
-            margin-right: 1rem;
-        }
-    }
-    
-    /* Hide Streamlit elements */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    .stDeployButton {display: none;}
-    
-    </style>
-    """, unsafe_allow_html=True)
+    load_stylesheet("theme-pro.css")
 
 def send_message(message: str):
     """Send message to backend"""
+    started = time.perf_counter()
+    ok = False
     try:
         response = requests.post(
             f"{BACKEND_URL}/chat",
@@ -304,9 +36,12 @@ def send_message(message: str):
             headers={"Content-Type": "application/json"}
         )
         response.raise_for_status()
-        return response.json()["response"]
+        reply = response.json()["response"]
+        ok = True
     except Exception as e:
-        return f"⚠️ Connection Error: {str(e)}\n\nPlease make sure the backend server is running on {BACKEND_URL}"
+        reply = f"⚠️ Connection Error: {str(e)}\n\nPlease make sure the backend server is running on {BACKEND_URL}"
+    get_usage_stats().record(message, ok, (time.perf_counter() - started) * 1000)
+    return reply
 
 def display_header():
     """Display the main header"""
@@ -380,6 +115,7 @@ def display_quick_actions():
 
 def display_usage_stats():
     """Display usage statistics"""
+    stats = get_usage_stats().summary()
     st.markdown("""
     <div class="sidebar-content">
         <div class="sidebar-header">
@@ -391,21 +127,43 @@ def display_usage_stats():
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-value">12</div>
+            <div class="metric-value">{stats['appointments']}</div>
             <div class="metric-label">Appointments</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col2:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-card">
-            <div class="metric-value">89%</div>
+            <div class="metric-value">{stats['success_rate']:.0%}</div>
             <div class="metric-label">Success Rate</div>
         </div>
         """, unsafe_allow_html=True)
 
+    st.caption(f"{stats['turns']} requests today · avg {stats['avg_latency_ms'] / 1000:.1f}s")
+    if st.toggle("📈 Show 24h trend", key="usage_trend"):
+        display_usage_trend()
+
+def display_usage_trend():
+    """Hourly requests and success rate for the last 24 hours"""
+    import plotly.graph_objects as go
+
+    trend = get_usage_stats().trend(GRAIN_HOUR, 24)
+    hours = [point["bucket"][-5:] for point in trend]
+    fig = go.Figure()
+    fig.add_bar(x=hours, y=[point["turns"] for point in trend], name="Requests", marker_color="#6366f1")
+    fig.add_scatter(
+        x=hours, y=[point["ok"] / point["turns"] * 100 if point["turns"] else None for point in trend],
+        name="Success %", yaxis="y2", mode="lines+markers", line_color="#10b981"
+    )
+    fig.update_layout(
+        height=220, margin=dict(l=0, r=0, t=10, b=0), showlegend=False,
+        yaxis=dict(title="Requests"), yaxis2=dict(overlaying="y", side="right", range=[0, 100], title="%")
+    )
+    st.plotly_chart(fig, config={"displayModeBar": False})
+
 def display_features():
     """Display feature highlights"""
     st.markdown("""
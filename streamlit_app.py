@@ -1,15 +1,49 @@
 import streamlit as st
-import requests
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List
-from dotenv import load_dotenv
+from functools import partial
 import os
+import time
+from typing import Dict, List
+
+from backend_client import (
+    BACKEND_URL, STREAMING_ENABLED, STREAM_ACCEPT,
+    BackendClient, ReplyFailed, get_backend_client, iter_stream_tokens
+)
+from wire_format import STRUCTURED_ACCEPT, decode_body, wire_bytes
+from health_monitor import HEALTH_TTL, HealthStatus, get_health_monitor
+from chat_executor import AdmissionRejected, ChatJob, get_chat_executor
+from message_html import build_message_html, cached_message_html
+from conversation_store import ChatMessage, ConversationStore, Role, is_conversation_id, new_conversation_id
+from context_window import ACK_HEADER, CONTEXT_SYNC_ENABLED, ContextSync, context_digest
+from response_cache import (
+    DEFAULT_SCOPE, RESPONSE_CACHE_ENABLED,
+    cached_stream, get_response_cache, is_mutating, is_read_only
+)
+from resilience import CircuitBreaker
+from single_flight import COALESCE_ENABLED, coalesced_stream, get_single_flight
+from rate_limit import TokenBucket
+from shared_state import get_shared_state
+from metrics import SHOW_PERF_PANEL, TIMINGS, TurnTimer, get_metrics
+from static_assets import load_stylesheet, stylesheet_tag
+from availability import SLOT_MINUTES, SlotIndex, answer_locally
+from bulk_booking import BULK_MAX_ROWS, DONE, FAILED, PENDING, RUNNING, SKIPPED, BulkJob, parse_bulk_requests
+from prefetch import PREFETCH_ENABLED, Prefetcher, prefetched_stream
 
-# Load environment variables
-load_dotenv()
-# Get backend URL from environment variable
-BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")  # Default to localhost if not set
+# Seconds between refreshes of the in-flight reply bubble
+CHAT_POLL_INTERVAL = 0.3
+# Messages rendered per history page; older ones sit behind "Load earlier messages"
+HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "40"))
+BULK_STATUS_LABELS = {PENDING: "🕒 Queued", RUNNING: "⏳ Sending", DONE: "✅ Done", FAILED: "⚠️ Failed",
+                      SKIPPED: "⏭️ Not sent"}
+# Sidebar prompts; each reads the same in any conversation, so their answers may be cached
+QUICK_ACTIONS = [
+    "Book appointment for tomorrow at 2 PM",
+    "Check availability for Monday morning",
+    "Suggest available times for this week",
+    "Schedule team meeting for Friday",
+    "Book doctor appointment next week"
+]
 
 # Page config
 st.set_page_config(
@@ -21,129 +55,87 @@ st.set_page_config(
 
 # Simple CSS for clean styling
 def load_custom_css():
-    st.markdown("""
-    <style>
-    /* Global styles */
-    .stApp {
-        background-color: #f8fafc;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-    }
-    
-    /* Header styling */
-    .main-header {
-        background: linear-gradient(135deg, #2563eb 0%, #7c3aed 100%);
-        padding: 2rem;
-        border-radius: 12px;
-        margin-bottom: 2rem;
-        color: white;
-        text-align: center;
-    }
-    
-    .main-header h1 {
-        font-size: 2.2rem;
-        font-weight: 600;
-        margin-bottom: 0.5rem;
-    }
-    
-    .main-header p {
-        font-size: 1rem;
-        opacity: 0.9;
-    }
-    
-    /* Message styling */
-    .user-message {
-        background: #2563eb;
-        color: white;
-        padding: 1rem;
-        border-radius: 12px 12px 4px 12px;
-        margin: 0.5rem 0;
-        margin-left: 2rem;
-    }
-    
-    .assistant-message {
-        background: #f1f5f9;
-        color: #1e293b;
-        padding: 1rem;
-        border-radius: 12px 12px 12px 4px;
-        margin: 0.5rem 0;
-        margin-right: 2rem;
-        border-left: 3px solid #06b6d4;
-    }
-    
-    /* Button styling */
-    .stButton > button {
-        background: #2563eb;
-        color: white;
-        border: none;
-        padding: 0.5rem 1rem;
-        border-radius: 8px;
-        font-weight: 500;
-        transition: background 0.3s ease;
-    }
-    
-    .stButton > button:hover {
-        background: #1d4ed8;
-    }
-    
-    /* Input styling */
-    .stTextInput > div > div > input {
-        border-radius: 8px;
-        border: 1px solid #d1d5db;
-        padding: 0.75rem;
-    }
-    
-    .stTextInput > div > div > input:focus {
-        border-color: #2563eb;
-        box-shadow: 0 0 0 2px rgba(37, 99, 235, 0.1);
-    }
-    
-    /* Sidebar styling */
-    .sidebar-section {
-        background: white;
-        border-radius: 8px;
-        padding: 1rem;
-        margin-bottom: 1rem;
-        border: 1px solid #e5e7eb;
-    }
-    
-    .sidebar-header {
-        font-weight: 600;
-        color: #374151;
-        margin-bottom: 0.5rem;
-        font-size: 1rem;
-    }
-    
-    /* Status indicator */
-    .status-online {
-        color: #10b981;
-        font-weight: 500;
-    }
-    
-    .status-offline {
-        color: #ef4444;
-        font-weight: 500;
-    }
-    
-    /* Hide default Streamlit elements */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    .stDeployButton {display: none;}
-    
-    </style>
-    """, unsafe_allow_html=True)
+    """Attach the theme stylesheet (static/theme.css)"""
+    load_stylesheet("theme.css")
+
+@st.cache_resource
+def init_app() -> bool:
+    """Run-once worker setup so the first visitor doesn't pay for it on their first rerun"""
+    get_backend_client()
+    get_health_monitor().status()  # starts the first /health probe in the background
+    get_chat_executor()
+    get_metrics()
+    stylesheet_tag("theme.css")
+    return True
+
+def connection_error_notice(error: Exception) -> str:
+    return f"⚠️ Connection Error: {str(error)}\n\nPlease make sure the backend server is running on {BACKEND_URL}"
 
-def send_message(message: str):
+def send_message(message: str, client: BackendClient = None, affinity_key: str = None,
+                 context: Dict = None, sync: ContextSync = None):
     """Send message to backend"""
+    client = client or get_backend_client()
+    timer = TurnTimer()
+    started = time.perf_counter()
     try:
-        response = requests.post(
-            f"{BACKEND_URL}/chat",
-            json={"content": message},
-            headers={"Content-Type": "application/json"}
+        response = client.open_chat(
+            {"content": message, **(context or {})},
+            headers={"Accept": STRUCTURED_ACCEPT},
+            idempotent=is_read_only(message),
+            affinity_key=affinity_key,
+            timer=timer
         )
         response.raise_for_status()
-        return response.json()["response"]
+        if sync is not None:
+            sync.ack(response.headers.get(ACK_HEADER))
+        timer.ttfb_ms = response.elapsed.total_seconds() * 1000
+        reply = timer.timed_decode(decode_body)(response)["response"]
+        timer.backend_ms = (time.perf_counter() - started) * 1000
+        client.metrics.record_turn(timer)
+        client.metrics.incr("response_wire_bytes", wire_bytes(response))
+        return reply
+    except Exception as e:
+        raise ReplyFailed(connection_error_notice(e)) from e
+
+def send_message_stream(message: str, on_response=None, client: BackendClient = None,
+                        affinity_key: str = None, context: Dict = None, sync: ContextSync = None):
+    """Send message to backend and yield the reply as it streams in"""
+    if not STREAMING_ENABLED:
+        yield send_message(message, client, affinity_key, context, sync)
+        return
+    client = client or get_backend_client()
+    timer = TurnTimer()
+    started = time.perf_counter()
+    try:
+        with client.open_chat(
+            {"content": message, "stream": True, **(context or {})},
+            headers={"Accept": STREAM_ACCEPT},
+            stream=True,
+            idempotent=is_read_only(message),
+            affinity_key=affinity_key,
+            timer=timer
+        ) as response:
+            timer.ttfb_ms = (time.perf_counter() - started) * 1000
+            if on_response is not None:
+                on_response(response)
+            response.raise_for_status()
+            if sync is not None:
+                sync.ack(response.headers.get(ACK_HEADER))
+            for token in iter_stream_tokens(response, timer):
+                yield token
+            received = wire_bytes(response)
+        timer.backend_ms = (time.perf_counter() - started) * 1000
+        client.metrics.record_turn(timer)
+        if received:
+            client.metrics.incr("response_wire_bytes", received)
     except Exception as e:
-        return f"⚠️ Connection Error: {str(e)}\n\nPlease make sure the backend server is running on {BACKEND_URL}"
+        # Raised, not yielded: a reply that broke off must never be cached or counted as an answer
+        raise ReplyFailed(connection_error_notice(e)) from e
+
+@st.fragment(run_every=HEALTH_TTL)
+def status_panel():
+    """Status indicator that re-reads the shared health cache on its own timer"""
+    display_status(check_backend_status(), get_backend_client().breaker)
 
 def display_header():
     """Display the main header"""
@@ -154,30 +146,343 @@ def display_header():
     </div>
     """, unsafe_allow_html=True)
 
-def check_backend_status():
-    """Check if backend is running"""
-    try:
-        response = requests.get(f"{BACKEND_URL}/health", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+def check_backend_status() -> HealthStatus:
+    """Get the last known backend status without waiting on a probe"""
+    return get_health_monitor().status()
+
+def display_status(status: HealthStatus, breaker: CircuitBreaker):
+    """Display the online/offline indicator with when it was last checked"""
+    if breaker.state == CircuitBreaker.OPEN:
+        st.markdown(f'<div class="status-degraded">🟠 System Degraded <span class="status-details">(pausing chat requests, retry in {breaker.retry_in():.0f}s)</span></div>', unsafe_allow_html=True)
+        return
+    if status.checked_at is None:
+        st.markdown('<div class="status-pending">🟡 Checking system status...</div>', unsafe_allow_html=True)
+        return
+
+    details = f"checked {status.checked_at.strftime('%H:%M:%S')}"
+    if status.latency_ms is not None:
+        details += f" · {status.latency_ms:.0f} ms"
+    if status.online:
+        st.markdown(f'<div class="status-online">🟢 System Online <span class="status-details">({details})</span></div>', unsafe_allow_html=True)
+    else:
+        st.markdown(f'<div class="status-offline">🔴 System Offline <span class="status-details">({details})</span></div>', unsafe_allow_html=True)
 
-def display_chat_message(message: Dict, is_user: bool = True):
+def display_chat_message(content: str, is_user: bool = True, message_id: str = None):
     """Display a chat message"""
-    if is_user:
-        st.markdown(f"""
-        <div class="user-message">
-            <strong>You:</strong><br>
-            {message['content']}
-        </div>
-        """, unsafe_allow_html=True)
+    if message_id is not None:
+        message_html = cached_message_html(message_id, content, is_user)
+    else:
+        message_html = build_message_html(content, is_user)
+    st.markdown(message_html, unsafe_allow_html=True)
+
+def submit_chat(prompt: str):
+    """Admit a prompt from the form or a quick action, refusing it straight away if this session is over its rate"""
+    limiter = st.session_state.rate_limiter
+    if not limiter.allow():
+        get_metrics().incr("rate_limited")
+        st.toast(f"Slow down a little: you can send again in {max(1, round(limiter.retry_in()))}s", icon="⏳")
+        return
+    start_chat(prompt)
+
+def is_standalone(prompt: str, conversation: ConversationStore) -> bool:
+    """Whether the reply can't depend on earlier turns: a quick action, or the conversation's first question"""
+    if prompt in QUICK_ACTIONS:
+        return True
+    return len(conversation) <= 2 and not any(message.is_user for message in conversation.recent(2)[:-1])
+
+def start_chat(prompt: str):
+    """Hand a prompt to the shared executor, or queue it behind the reply in flight"""
+    if st.session_state.pending_job is not None:
+        st.session_state.queued_prompts.append(prompt)
+        return
+    st.session_state.conversation.append(Role.USER, prompt)
+    # Questions the loaded free/busy slots can answer never reach the backend
+    if st.session_state.slot_index is not None:
+        answer = answer_locally(prompt, st.session_state.slot_index)
+        if answer is not None:
+            st.session_state.conversation.append(Role.ASSISTANT, answer, local=True)
+            get_metrics().incr("local_answers")
+            return
+    # Send only the history the backend hasn't acknowledged, within the token budget
+    sync = st.session_state.context_sync
+    context = sync.build(st.session_state.conversation) if CONTEXT_SYNC_ENABLED else None
+    # Resolve the shared client here; worker threads have no script context
+    # Keep the conversation on one replica in case the backend holds agent state in memory
+    stream_fn = partial(
+        send_message_stream,
+        client=get_backend_client(),
+        affinity_key=st.session_state.conversation.session_id,
+        context=context,
+        sync=sync if CONTEXT_SYNC_ENABLED else None
+    )
+    if COALESCE_ENABLED:
+        stream_fn = coalesced_stream(get_single_flight(), DEFAULT_SCOPE, stream_fn, context_digest(context))
+    # The cache is keyed on the prompt alone, so only answers that don't depend on the conversation go in it
+    if RESPONSE_CACHE_ENABLED and is_standalone(prompt, st.session_state.conversation):
+        stream_fn = cached_stream(get_response_cache(), DEFAULT_SCOPE, stream_fn)
+    if PREFETCH_ENABLED:
+        stream_fn = prefetched_stream(st.session_state.prefetcher, stream_fn)
+    try:
+        st.session_state.pending_job = get_chat_executor().submit(
+            prompt, stream_fn, on_done=partial(store_reply, st.session_state.conversation)
+        )
+    except AdmissionRejected as e:
+        # Refuse now rather than pile more work on a backend that is already behind
+        get_metrics().incr("rejected_chats")
+        st.session_state.conversation.append(Role.ASSISTANT, f"⚠️ {str(e)}.", local=True)
+
+def store_reply(conversation: ConversationStore, job: ChatJob):
+    """On the worker: store the finished reply at once, so a reload mid-turn still finds it"""
+    message = ChatMessage(Role.ASSISTANT, job.text, local=job.failed)
+    if job.settle(message) is message:
+        conversation.persist(message)
+
+def prefetch_followups(prompt: str, reply: str):
+    """Speculatively fetch the likely next questions while the user reads the reply"""
+    # Standalone read-only questions: no conversation context, so the backend stores nothing for them
+    stream_fn = partial(send_message_stream, client=get_backend_client(),
+                        affinity_key=st.session_state.conversation.session_id)
+    if COALESCE_ENABLED:
+        stream_fn = coalesced_stream(get_single_flight(), DEFAULT_SCOPE, stream_fn)
+    if RESPONSE_CACHE_ENABLED:
+        stream_fn = cached_stream(get_response_cache(), DEFAULT_SCOPE, stream_fn)
+    st.session_state.prefetcher.schedule(prompt, reply, stream_fn)
+
+def submit_chat_input():
+    """Form callback: submit the typed message before the script reruns"""
+    user_input = st.session_state.chat_input
+    if user_input:
+        submit_chat(user_input)
+
+def open_conversation(conversation_id: str):
+    """Point this session at a conversation: its store, its context sync and the ?c= link"""
+    st.query_params["c"] = conversation_id
+    st.session_state.conversation = ConversationStore(conversation_id)
+    st.session_state.context_sync = ContextSync(conversation_id, shared=get_shared_state())
+
+def clear_chat():
+    """Form callback: cancel anything in flight, delete the conversation and start a new one"""
+    if st.session_state.pending_job is not None:
+        st.session_state.pending_job.cancel()
+    st.session_state.pending_job = None
+    st.session_state.queued_prompts = []
+    st.session_state.conversation.clear()
+    # A fresh id rather than a rewind: turn numbers of a conversation only ever grow
+    open_conversation(new_conversation_id())
+    st.session_state.prefetcher.cancel()
+    st.session_state.history_window = HISTORY_WINDOW
+
+def complete_pending_reply():
+    """Move the finished (or cancelled) reply into the history and start the next queued prompt"""
+    job = st.session_state.pending_job
+    content = job.text
+    if job.cancelled:
+        content = f"{content}\n\n⏹️ Request cancelled." if content else "⏹️ Request cancelled."
+    # The worker has usually stored the reply already; otherwise (cancelled) it is ours to store.
+    # A cancelled or failed reply is only half the backend's, so it stays out of the history sent back
+    reply = ChatMessage(Role.ASSISTANT, content, local=job.cancelled or job.failed)
+    message = job.settle(reply)
+    if message is reply:
+        st.session_state.conversation.persist(message)
+    st.session_state.conversation.adopt(message)
+    cancelled = message is reply and job.cancelled
+    st.session_state.pending_job = None
+    if is_mutating(job.prompt) and not cancelled:
+        # A booking may have changed availability; cached answers and loaded slots are stale now
+        forget_availability()
+        if RESPONSE_CACHE_ENABLED:
+            get_response_cache().invalidate(DEFAULT_SCOPE)
+        st.session_state.prefetcher.cancel()
+    if st.session_state.queued_prompts:
+        start_chat(st.session_state.queued_prompts.pop(0))
+    elif PREFETCH_ENABLED and not cancelled and not job.failed:
+        prefetch_followups(job.prompt, message.content)
+
+@st.fragment(run_every=CHAT_POLL_INTERVAL)
+def pending_reply():
+    """Poll the in-flight reply and render it without rerunning the whole page"""
+    job = st.session_state.pending_job
+    if job is None:
+        return
+    if job.done:
+        complete_pending_reply()
+        st.rerun()
+
+    position = get_chat_executor().position(job)
+    if position:
+        display_chat_message(f"⏳ Queued (position {position}), the assistant is busy with other requests...",
+                             is_user=False)
     else:
-        st.markdown(f"""
-        <div class="assistant-message">
-            <strong>🤖 CalendarAI:</strong><br>
-            {message['content']}
-        </div>
-        """, unsafe_allow_html=True)
+        display_chat_message(job.text or "🤖 CalendarAI is thinking...", is_user=False)
+    for i, prompt in enumerate(st.session_state.queued_prompts, start=1):
+        st.caption(f"⏳ Queued ({i}): {prompt}")
+    if st.button("Cancel ✋", key="cancel_chat"):
+        job.cancel()
+        complete_pending_reply()
+        st.rerun()
+
+@st.fragment
+def chat_history():
+    """Render the latest page of the conversation; older pages load on demand"""
+    conversation = st.session_state.conversation
+    total = len(conversation)
+    start = max(0, total - st.session_state.history_window)
+    if start > 0:
+        if st.button(f"⬆️ Load earlier messages ({start} hidden)", key="load_earlier"):
+            st.session_state.history_window += HISTORY_WINDOW
+            st.rerun(scope="fragment")
+
+    for message in conversation.slice(start, total):
+        display_chat_message(message.content, message.is_user, message.id)
+
+def start_bulk_booking():
+    """Bulk form callback: parse the pasted list or uploaded CSV and start sending it"""
+    upload = st.session_state.bulk_file
+    text = upload.getvalue().decode("utf-8-sig") if upload is not None else st.session_state.bulk_input
+    prompts = parse_bulk_requests(text or "")
+    if not prompts:
+        st.toast("No booking requests found", icon="⚠️")
+        return
+    if len(prompts) > BULK_MAX_ROWS:
+        st.toast(f"Only the first {BULK_MAX_ROWS} of {len(prompts)} requests were sent", icon="⚠️")
+        prompts = prompts[:BULK_MAX_ROWS]
+    if st.session_state.bulk_job is not None:
+        st.session_state.bulk_job.cancel()
+    # Resolve the shared client here; worker threads have no script context
+    # No affinity key: independent bookings can spread across replicas
+    send_fn = partial(send_message, client=get_backend_client())
+    st.session_state.bulk_job = BulkJob(prompts, send_fn, get_chat_executor())
+    st.session_state.bulk_settled = False
+
+def clear_bulk_booking():
+    if st.session_state.bulk_job is not None:
+        st.session_state.bulk_job.cancel()
+    st.session_state.bulk_job = None
+
+def retry_bulk_booking(indices: List[int] = None):
+    """Resend the selected rows, or every failed one"""
+    st.session_state.bulk_job.retry(indices)
+    st.session_state.bulk_settled = False
+
+def settle_bulk_booking():
+    """Run once each time a batch finishes"""
+    if not st.session_state.bulk_settled:
+        st.session_state.bulk_settled = True
+        # Bookings changed availability; cached answers and loaded slots are stale now
+        forget_availability()
+        if RESPONSE_CACHE_ENABLED:
+            get_response_cache().invalidate(DEFAULT_SCOPE)
+
+def bulk_table(job: BulkJob) -> List[Dict]:
+    rows = job.snapshot()
+    for row in rows:
+        row["Status"] = BULK_STATUS_LABELS[row["Status"]]
+    return rows
+
+@st.fragment(run_every=CHAT_POLL_INTERVAL)
+def bulk_progress():
+    """Poll a batch in flight and fill in its results table as rows finish"""
+    job = st.session_state.bulk_job
+    if job is None:
+        return
+    if job.done:
+        st.rerun()
+
+    counts = job.counts()
+    finished = counts[DONE] + counts[FAILED]
+    st.progress(finished / len(job.rows), text=f"{finished} of {len(job.rows)} sent · {counts[FAILED]} failed")
+    st.dataframe(bulk_table(job), hide_index=True)
+    if st.button("Stop batch ✋", key="bulk_cancel"):
+        job.cancel()
+
+def bulk_results(job: BulkJob):
+    """Finished batch: selectable results table with retry buttons"""
+    settle_bulk_booking()
+    counts = job.counts()
+    st.caption(f"✅ {counts[DONE]} done · ⚠️ {counts[FAILED]} failed · ⏭️ {counts[SKIPPED]} not sent")
+    event = st.dataframe(bulk_table(job), hide_index=True, key="bulk_table",
+                         on_select="rerun", selection_mode="multi-row")
+    # Done rows are never resent: that would book them twice
+    selected = job.retryable(event.selection.rows)
+    col_failed, col_selected, col_clear = st.columns(3)
+    with col_failed:
+        st.button(f"🔁 Retry failed ({counts[FAILED]})", key="bulk_retry_failed",
+                  on_click=retry_bulk_booking, disabled=not counts[FAILED])
+    with col_selected:
+        st.button(f"🔁 Retry selected ({len(selected)})", key="bulk_retry_selected",
+                  on_click=retry_bulk_booking, args=(selected,), disabled=not selected)
+    with col_clear:
+        st.button("Clear results", key="bulk_clear", on_click=clear_bulk_booking)
+
+def display_bulk_booking():
+    """Bulk mode: many booking requests from a pasted list or CSV upload"""
+    job = st.session_state.bulk_job
+    with st.expander("📦 Bulk booking", expanded=job is not None):
+        with st.form("bulk_form", clear_on_submit=True):
+            st.text_area(
+                "One booking request per line",
+                key="bulk_input",
+                placeholder="Team standup Monday 9 AM\nTeam standup Tuesday 9 AM\n...",
+                height=120
+            )
+            st.file_uploader("...or a CSV (a 'request' column, or title/date/time columns)",
+                             type=["csv", "txt"], key="bulk_file")
+            st.form_submit_button("Send batch 📦", on_click=start_bulk_booking)
+
+        if job is None:
+            return
+        if job.done:
+            bulk_results(job)
+        else:
+            bulk_progress()
+
+def load_availability():
+    """Availability callback: fetch free/busy for the chosen week into the session's slot index"""
+    picked = st.session_state.availability_week
+    week_start = datetime.combine(picked - timedelta(days=picked.weekday()), datetime.min.time())
+    week_end = week_start + timedelta(days=7)
+    try:
+        payload = get_backend_client().fetch_availability(week_start.isoformat(), week_end.isoformat())
+        st.session_state.slot_index = SlotIndex.from_payload(payload, week_start, week_end)
+    except Exception as e:
+        st.toast(f"Couldn't load availability: {str(e)}", icon="⚠️")
+
+def forget_availability():
+    st.session_state.slot_index = None
+
+@st.fragment
+def display_availability():
+    """Week grid and instant slot queries over the session's free/busy index"""
+    index = st.session_state.slot_index
+    with st.expander("🗓️ Availability", expanded=index is not None):
+        col_week, col_load = st.columns([2, 1])
+        with col_week:
+            st.date_input("Week of", key="availability_week", value=datetime.now().date())
+        with col_load:
+            st.button("Load week 🔄", key="availability_load", on_click=load_availability)
+        if index is None:
+            st.caption("Load a week to browse free slots and ask about them without waiting on the assistant.")
+            return
+
+        week_start = index.window_start.date()
+        st.dataframe(index.week_grid(week_start), hide_index=True)
+
+        col_day, col_length = st.columns(2)
+        with col_day:
+            day = st.selectbox("Day", [week_start + timedelta(days=i) for i in range(7)],
+                               format_func=lambda d: d.strftime("%A %d %b"), key="availability_day")
+        with col_length:
+            minutes = st.select_slider("Length (min)", sorted({15, 30, 45, 60, 90, 120, SLOT_MINUTES}),
+                                       value=SLOT_MINUTES, key="availability_minutes")
+        slots = index.free_slots(day, minutes)
+        st.markdown(" · ".join(f"`{start:%H:%M}–{end:%H:%M}`" for start, end in slots)
+                    or "No free slots that long.")
+
+        question = st.text_input("Ask about these slots", key="availability_question",
+                                 placeholder="e.g. 'Is Tuesday 3 PM free?' or 'next 60 minute gap'")
+        if question:
+            st.markdown(answer_locally(question, index)
+                        or "🤖 That needs the assistant, ask it in the chat.")
 
 def display_quick_actions():
     """Display quick action buttons"""
@@ -187,18 +492,12 @@ def display_quick_actions():
     </div>
     """, unsafe_allow_html=True)
     
-    quick_actions = [
-        "Book appointment for tomorrow at 2 PM",
-        "Check availability for Monday morning",
-        "Suggest available times for this week",
-        "Schedule team meeting for Friday",
-        "Book doctor appointment next week"
-    ]
+    for i, action in enumerate(QUICK_ACTIONS):
+        st.button(action, key=f"quick_{i}", on_click=submit_chat, args=(action,))
     
-    for i, action in enumerate(quick_actions):
-        if st.button(action, key=f"quick_{i}"):
-            return action
-    return None
+    if RESPONSE_CACHE_ENABLED:
+        stats = get_response_cache().stats()
+        st.caption(f"⚡ Cached answers: {stats['hits']} hits / {stats['misses']} misses")
 
 def display_features():
     """Display feature list"""
@@ -219,19 +518,37 @@ def display_features():
     for feature in features:
         st.markdown(f"• {feature}")
 
+def display_performance_panel():
+    """Display p50/p95/p99 timings and counters for this worker"""
+    metrics = get_metrics()
+    with st.expander("📈 Performance", expanded=False):
+        summary = metrics.summary()
+        rows = [
+            {"Timing": label, "n": s["count"], "p50 ms": round(s["p50"], 1),
+             "p95 ms": round(s["p95"], 1), "p99 ms": round(s["p99"], 1)}
+            for name, label in TIMINGS.items()
+            for s in [summary[name]]
+        ]
+        st.dataframe(rows, hide_index=True)
+        load = get_chat_executor().load()
+        st.caption(f"Chat executor: {load['active']} running · {load['waiting']} waiting")
+        counters = metrics.counters()
+        st.caption(" · ".join(f"{name}: {value}" for name, value in sorted(counters.items())) or "No samples yet")
+
 def main():
+    render_started = time.perf_counter()
+    
+    # One-time worker setup (cached after the first run)
+    init_app()
+    
     # Load custom CSS
     load_custom_css()
     
     # Display header
     display_header()
     
-    # Check backend status
-    is_online = check_backend_status()
-    if is_online:
-        st.markdown('<div class="status-online">🟢 System Online</div>', unsafe_allow_html=True)
-    else:
-        st.markdown('<div class="status-offline">🔴 System Offline</div>', unsafe_allow_html=True)
+    # Show last known backend status (refreshed in the background)
+    status_panel()
     
     st.markdown("---")
     
@@ -241,75 +558,69 @@ def main():
     with col1:
         st.markdown("### 💬 Chat")
         
-        # Initialize chat history
-        if "messages" not in st.session_state:
-            st.session_state.messages = []
-            # Add welcome message
-            st.session_state.messages.append({
-                "role": "assistant", 
-                "content": "👋 Welcome to CalendarAI! I can help you:\n\n• Book appointments and meetings\n• Check calendar availability\n• Suggest optimal time slots\n• Manage your schedule efficiently\n\nWhat would you like to do today?"
-            })
+        # Initialize chat history, resuming the conversation in the URL after a reload or restart
+        if "conversation" not in st.session_state:
+            conversation_id = st.query_params.get("c")
+            if not is_conversation_id(conversation_id):
+                conversation_id = new_conversation_id()
+            open_conversation(conversation_id)
+            if not len(st.session_state.conversation):
+                # Add welcome message
+                st.session_state.conversation.append(
+                    Role.ASSISTANT,
+                    "👋 Welcome to CalendarAI! I can help you:\n\n• Book appointments and meetings\n• Check calendar availability\n• Suggest optimal time slots\n• Manage your schedule efficiently\n\nWhat would you like to do today?",
+                    local=True
+                )
+        if "pending_job" not in st.session_state:
+            st.session_state.pending_job = None
+            st.session_state.queued_prompts = []
+            st.session_state.history_window = HISTORY_WINDOW
+            st.session_state.rate_limiter = TokenBucket()
+            st.session_state.prefetcher = Prefetcher(get_chat_executor(), get_metrics())
+        if "slot_index" not in st.session_state:
+            st.session_state.slot_index = None
+        if "bulk_job" not in st.session_state:
+            st.session_state.bulk_job = None
+            st.session_state.bulk_settled = True
         
         # Display chat history
         chat_container = st.container()
         with chat_container:
-            for message in st.session_state.messages:
-                if message["role"] == "user":
-                    display_chat_message(message, is_user=True)
-                else:
-                    display_chat_message(message, is_user=False)
+            chat_history()
+            
+            # Reply still in flight on the shared executor
+            if st.session_state.pending_job is not None:
+                pending_reply()
         
         # Chat input
         st.markdown("---")
         
-        # Input form
+        # Input form (callbacks run before the rerun, so the new turn renders in a single pass)
         with st.form("chat_form", clear_on_submit=True):
-            user_input = st.text_input(
+            st.text_input(
                 "Type your message...",
+                key="chat_input",
                 placeholder="e.g., 'Book a meeting tomorrow at 3 PM'"
             )
             
             col_send, col_clear = st.columns([1, 1])
             
             with col_send:
-                send_button = st.form_submit_button("Send Message 📤", type="primary")
+                st.form_submit_button("Send Message 📤", type="primary", on_click=submit_chat_input)
             
             with col_clear:
-                if st.form_submit_button("Clear Chat 🗑️"):
-                    st.session_state.messages = []
-                    st.rerun()
+                st.form_submit_button("Clear Chat 🗑️", on_click=clear_chat)
         
-        # Handle user input
-        if send_button and user_input:
-            # Add user message
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            
-            # Show loading
-            with st.spinner("🤖 CalendarAI is thinking..."):
-                response = send_message(user_input)
-            
-            # Add assistant response
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            
-            # Rerun to update chat
-            st.rerun()
+        # Structured availability
+        display_availability()
+        
+        # Bulk booking mode
+        display_bulk_booking()
     
     with col2:
         # Sidebar content
         st.markdown("### 🎯 Quick Actions")
-        quick_action = display_quick_actions()
-        
-        if quick_action:
-            # Add quick action as user message
-            st.session_state.messages.append({"role": "user", "content": quick_action})
-            
-            # Get response
-            with st.spinner("🤖 Processing..."):
-                response = send_message(quick_action)
-            
-            # Add assistant response
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            st.rerun()
+        display_quick_actions()
         
         # st.markdown("---")
         
@@ -319,6 +630,10 @@ def main():
         
         # st.markdown("---")
         
+        # Optional performance panel
+        if SHOW_PERF_PANEL or st.query_params.get("perf") == "1":
+            display_performance_panel()
+        
         # Support section
         # st.markdown("""
         # <div class="sidebar-section">
@@ -328,6 +643,11 @@ def main():
         #     </p>
         # </div>
         # """, unsafe_allow_html=True)
+    
+    # Record how long this rerun took to build
+    metrics = get_metrics()
+    metrics.incr("reruns")
+    metrics.observe("render_ms", (time.perf_counter() - render_started) * 1000)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,201 @@
+import streamlit as st
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from streamlit.logger import get_logger
+
+from shared_state import sqlite_journal_pragma
+
+# SQLite file with the append-only event log and its rollups (shared by every worker on the host)
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", os.path.join(tempfile.gettempdir(), "calendarai_usage.sqlite3"))
+# Raw events older than this many days are pruned when a worker first opens the file; rollups are kept
+USAGE_RETENTION_DAYS = float(os.getenv("USAGE_RETENTION_DAYS", "30"))
+# Seconds the sidebar reuses a summary before reading the rollups again
+USAGE_SUMMARY_TTL = float(os.getenv("USAGE_SUMMARY_TTL", "10"))
+# Events written per transaction at most
+USAGE_BATCH_SIZE = 500
+
+# First match wins, so booking beats the "check"/"find" words a booking prompt often contains
+INTENTS = (
+    ("cancel", re.compile(r"\b(cancel|delete|remove)\b")),
+    ("reschedule", re.compile(r"\b(reschedule|move)\b")),
+    ("book", re.compile(r"\b(book|schedule|reserve|set up)\b")),
+    ("availability", re.compile(r"\b(check|availab\w*|free|open)\b")),
+    ("suggest", re.compile(r"\b(suggest|recommend|best time)\b")),
+)
+
+GRAIN_DAY = "day"
+GRAIN_HOUR = "hour"
+_BUCKET_FORMATS = {GRAIN_DAY: "%Y-%m-%d", GRAIN_HOUR: "%Y-%m-%d %H:00"}
+
+logger = get_logger("calendarai.usage")
+
+
+def classify_intent(prompt: str) -> str:
+    text = prompt.casefold()
+    for intent, pattern in INTENTS:
+        if pattern.search(text):
+            return intent
+    return "other"
+
+
+def bucket(grain: str, ts: float) -> str:
+    """Local-time rollup bucket ("2024-05-01" or "2024-05-01 13:00") holding ts"""
+    return time.strftime(_BUCKET_FORMATS[grain], time.localtime(ts))
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute(sqlite_journal_pragma())
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS usage_events (
+            ts REAL NOT NULL,
+            intent TEXT NOT NULL,
+            ok INTEGER NOT NULL,
+            latency_ms REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS usage_rollups (
+            grain TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            intent TEXT NOT NULL,
+            turns INTEGER NOT NULL,
+            ok INTEGER NOT NULL,
+            latency_ms_sum REAL NOT NULL,
+            PRIMARY KEY (grain, bucket, intent)
+        );
+    """)
+    conn.execute("DELETE FROM usage_events WHERE ts < ?", (time.time() - USAGE_RETENTION_DAYS * 86400,))
+    conn.commit()
+    return conn
+
+
+class UsageStats:
+    """Append-only log of chat turns with per-day and per-hour rollups kept up to date on write
+
+    record() only enqueues; a background thread writes batches, appending the events and
+    bumping their rollup rows in the same transaction. Readers never scan the event log.
+    """
+
+    def __init__(self, path: str = USAGE_DB_PATH, summary_ttl: float = USAGE_SUMMARY_TTL):
+        self._path = path
+        self._summary_ttl = summary_ttl
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._read_conn = None
+        self._cache = {}  # key -> (expires_at, value)
+        threading.Thread(target=self._writer, name="usage-writer", daemon=True).start()
+
+    def record(self, prompt: str, ok: bool, latency_ms: float):
+        """Log one finished turn (ok: the backend answered in full); never blocks on disk"""
+        self._queue.put((time.time(), classify_intent(prompt), 1 if ok else 0, latency_ms))
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until everything recorded so far is on disk"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def summary(self, day: str = None) -> Dict[str, float]:
+        """Totals for one day (today by default) from the daily rollup"""
+        day = day or bucket(GRAIN_DAY, time.time())
+        return self._cached(("summary", day), lambda: self._summary(day))
+
+    def trend(self, grain: str = GRAIN_HOUR, buckets: int = 24) -> List[Dict[str, float]]:
+        """turns / ok / avg latency for the last buckets hours or days, oldest first, gaps filled with zeros"""
+        return self._cached(("trend", grain, buckets), lambda: self._trend(grain, buckets))
+
+    def _cached(self, key: Tuple, load):
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = load()
+        self._cache[key] = (now + self._summary_ttl, value)
+        return value
+
+    def _query(self, sql: str, params: Tuple) -> List[Tuple]:
+        with self._read_lock:
+            if self._read_conn is None:
+                self._read_conn = _connect(self._path)
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def _summary(self, day: str) -> Dict[str, float]:
+        rows = self._query(
+            "SELECT intent, turns, ok, latency_ms_sum FROM usage_rollups WHERE grain = ? AND bucket = ?",
+            (GRAIN_DAY, day)
+        )
+        turns = sum(row[1] for row in rows)
+        ok = sum(row[2] for row in rows)
+        latency = sum(row[3] for row in rows)
+        return {
+            "turns": turns,
+            "appointments": sum(row[2] for row in rows if row[0] == "book"),
+            "success_rate": ok / turns if turns else 0.0,
+            "avg_latency_ms": latency / turns if turns else 0.0,
+        }
+
+    def _trend(self, grain: str, buckets: int) -> List[Dict[str, float]]:
+        step = 3600 if grain == GRAIN_HOUR else 86400
+        now = time.time()
+        labels = [bucket(grain, now - step * i) for i in reversed(range(buckets))]
+        rows = self._query(
+            "SELECT bucket, SUM(turns), SUM(ok), SUM(latency_ms_sum) FROM usage_rollups "
+            "WHERE grain = ? AND bucket >= ? GROUP BY bucket",
+            (grain, labels[0])
+        )
+        by_bucket = {row[0]: row[1:] for row in rows}
+        trend = []
+        for label in labels:
+            turns, ok, latency = by_bucket.get(label, (0, 0, 0.0))
+            trend.append({"bucket": label, "turns": turns, "ok": ok,
+                          "avg_latency_ms": latency / turns if turns else 0.0})
+        return trend
+
+    def _writer(self):
+        conn = _connect(self._path)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < USAGE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = [item for item in batch if not isinstance(item, threading.Event)]
+            if events:
+                try:
+                    self._write(conn, events)
+                except sqlite3.Error as e:
+                    logger.warning("dropped %d usage events: %s", len(events), e)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, conn: sqlite3.Connection, events: List[Tuple]):
+        rollups = {}
+        for ts, intent, ok, latency_ms in events:
+            for grain in (GRAIN_DAY, GRAIN_HOUR):
+                row = rollups.setdefault((grain, bucket(grain, ts), intent), [0, 0, 0.0])
+                row[0] += 1
+                row[1] += ok
+                row[2] += latency_ms
+        with conn:
+            conn.executemany("INSERT INTO usage_events VALUES (?, ?, ?, ?)", events)
+            conn.executemany(
+                "INSERT INTO usage_rollups VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (grain, bucket, intent) DO UPDATE SET "
+                "turns = turns + excluded.turns, ok = ok + excluded.ok, "
+                "latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum",
+                [key + tuple(values) for key, values in rollups.items()]
+            )
+
+
+@st.cache_resource
+def get_usage_stats() -> UsageStats:
+    """Usage log shared by every session in this worker"""
+    return UsageStats()
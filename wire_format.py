@@ -0,0 +1,49 @@
+import json
+import os
+
+import requests
+
+# Optional fast paths; everything falls back to stdlib json when they are missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Ask for msgpack bodies on structured endpoints when the package is installed
+MSGPACK_ENABLED = msgpack is not None and os.getenv("BACKEND_MSGPACK", "1") not in ("0", "false", "False")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# gzip and deflate always; br / zstd too when brotli / zstandard are installed (urllib3 decodes them)
+ACCEPT_ENCODING = requests.utils.DEFAULT_ACCEPT_ENCODING
+# Accept header for JSON-shaped endpoints (non-streamed /chat, /availability)
+STRUCTURED_ACCEPT = "application/msgpack, application/json;q=0.9" if MSGPACK_ENABLED else "application/json"
+
+loads_json = orjson.loads if orjson is not None else json.loads
+
+
+def content_type(response: requests.Response) -> str:
+    return response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+
+def decode_body(response: requests.Response):
+    """Decode a JSON or msgpack body (already decompressed by urllib3)"""
+    if content_type(response) in MSGPACK_TYPES:
+        if msgpack is None:
+            raise ValueError("Backend sent msgpack but the msgpack package is not installed")
+        return msgpack.unpackb(response.content, raw=False)
+    return loads_json(response.content)
+
+
+def wire_bytes(response: requests.Response) -> int:
+    """Bytes read off the socket for this body, before decompression (0 where urllib3 doesn't count: chunked bodies)"""
+    downloaded = getattr(response, "num_bytes_downloaded", None)  # AsyncResponse
+    if downloaded is not None:
+        return downloaded
+    try:
+        return response.raw.tell()
+    except Exception:
+        return 0